@@ -4,10 +4,10 @@
 import sys
 import math
 import queue
-from packet import Packet
+from flow import SendFlow
 from dataclasses import dataclass
 from math import fabs
-from collections import defaultdict
+from collections import deque
 
 class Host:
     """Host class"""
@@ -15,286 +15,348 @@ class Host:
     def __init__(self, addr):
         """Inititalize parameters"""
         self.addr = addr
+        self.id = None  # node ID, assigned by the network
+        self.nodeNames = None  # node names indexed by node ID, for logs
         self.link = None
+        self.inbox = []  # packets delivered from the link in this timeslot, as (port, packet);
+                         # at most one, as the other end sends at most one packet per timeslot
         
-        self.flow_track = {}
-        self.reordering_count = 0
-        self.initial_seq = 0
-        self.reordering_cnt = defaultdict(int)        # per-flow cumulative count
-        self._reorder_events_outbox = defaultdict(list)
+        self.reorderSink = None  # reordering events of the network, shared by all hosts
 
 
-        self.priority = {}  # a dictionary storing state for active flows sourced at this host
-                            # key: 3-tuple (dst addr, src port, dst port)
-                            # value: [flow size (in number of packets), next seq num to send, last ack num recvd, timer]
-        
-        self.sFlows = {}    # a dictionary storing state for active flows sourced at this host
-                            # key: 3-tuple (dst addr, src port, dst port)
-                            # value: [flow size (in number of packets), next seq num to send, last ack num recvd, timer]
+        self.flowTable = None  # FlowTable of the network, shared by all hosts; it owns sendFlows and recvFlows
+
+        self.sendFlows = None  # SendFlow of every flow in the network, indexed by flow ID (None once finished);
+                               # shared by all hosts, a host only touches the flows it sources
 
-        self.rFlows = {}    # a dictionary storing state for active flows destined to this host
-                            # key: 3-tuple (src addr, src port, dst port)
-                            # value: [id, flow size (in number of packets), next expected seq num, flow start time, time last pkt sent, dup ack sent]
+        self.recvFlows = None  # RecvFlow of every flow in the network, indexed by flow ID (None once finished);
+                               # shared by all hosts, a host only touches the flows destined to it
 
-        self.rrSched = []   # stores the list of active flows sourced at this host
-                            # for round-robin scheduling
+        self.ready = [deque() for _ in range(3)]  # SendFlows that can send a packet now, per priority class
+                                                  # (index priority - 1), each served in round-robin order;
+                                                  # a listed flow may have become blocked or finished since, it is then
+                                                  # dropped when it reaches the head
 
-        self.rrPointer = 0  # points to the flow to be scheduled according to round-robin
+        self.packetLog = None  # PacketLog of the packets received by all hosts, None unless packets are logged
 
-        self.cwnd = {}      # a dictionary storing the congestion window for active flows
-                            # key: 3-tuple (dst addr, src port, dst port)
-                            # value: congestion window
+        self.routeTracer = None  # decides which sent packets record their route, None if route tracing is off
 
-        self.alpha = {}     # a dictionary storing the alpha value for active flows
-                            # key: 3-tuple (dst addr, src port, dst port)
-                            # value: alpha
+        self.packetPool = None  # packets are taken from and released to this pool, shared by all nodes
 
-        self.numPktSentInCurrWin = {}   # key: 3-tuple (dst addr, src port, dst port)
-                                        # value: number of packets sent in current window
+        self.activeHosts = None  # active set of the network, woken when an ack is enqueued
 
-        self.packetLogFile = None
+        self.RTO = 1000  # in unit of timeslots
 
-        self.numAckRecvdInCurrWin = {}     # key: 3-tuple (dst addr, src port, dst port)
-                                           # value: number of acks received in current window
+        self.oooWindow = 4096  # out-of-order arrivals are remembered up to this many seq nums past the next
+                               # expected one; one beyond is counted on every arrival, duplicates included
 
-        self.numECNAckRecvdInCurrWin = {}  # key: 3-tuple (dst addr, src port, dst port)
-                                           # value: number of acks received in current window with ECN flag set
+        self.rtoTimers = deque()  # retransmission timers as (expiry timeslot, SendFlow), armed on every send;
+                                  # the RTO is the same for all flows, so they are armed in expiry order.
+                                  # A timer is stale once the flow sends again or finishes
 
-        self.RTO = 1000  # in unit of timeslots
+        self.delayedAck = 1  # in-order packets acknowledged by one cumulative ACK; a pending ACK is sent early
+                             # when the ECN flag changes, the flow completes, or a packet arrives out of order
 
+        self.ackDelay = 40  # in unit of timeslots (about a base RTT); a pending ACK is sent at most this late
+
+        self.ackTimers = deque()  # delayed ACK timers as (deadline, RecvFlow), in deadline order.
+                                  # A timer is stale once the flow's pending ACK has been sent
+
+        self.expiredFlows = {}  # SendFlows whose timer expired and that have not sent since, in expiry order
+                                # (a dict used as an ordered set); a blocked one goes back N in every timeslot
 
-    def logPacket(self, packet):
-        self.packetLogFile.write("src: " + packet.srcAddr + ", dst: " + packet.dstAddr)
-        self.packetLogFile.write(", sport: " + str(packet.srcPort) + ", dport: " + str(packet.dstPort))
-        self.packetLogFile.write(", seqNum: " + str(packet.seqNum) + ", ackNum: " + str(packet.ackNum))
-        self.packetLogFile.write(", ackFlag: " + str(packet.ackFlag) + ", ecnFlag: " + str(packet.ecnFlag))
-        self.packetLogFile.write(", route: ")
-        self.packetLogFile.write('->'.join('(%s,%s,%s)' % x for x in packet.route))
-        self.packetLogFile.write("\n\n")
-        self.packetLogFile.flush()
 
     def _key(self, pkt):
         return (pkt.dstAddr, pkt.srcAddr, pkt.dstPort, pkt.srcPort)
 
-    def on_packet(self, pkt) -> bool:
-        key = self._key(pkt)
-        st = self.flow_track.get(key)
-        if st is None:
-            st = {"next_expected": self.initial_seq, "ooo_set": set()}
-            self.flow_track[key] = st
-
+    def on_packet(self, flow, pkt) -> bool:
+        """Track the arrival order of the data packet pkt of flow, a RecvFlow.
+           Returns True if pkt is an out-of-order arrival seen for the first time,
+           which is recorded in the reorderSink"""
         seq = pkt.seqNum
-        ne  = st["next_expected"]
-        oset = st["ooo_set"]
+        ne = flow.oooNext
 
         if seq == ne:
-            ne += 1
-            while ne in oset:
-                oset.remove(ne)
-                ne += 1
-            st["next_expected"] = ne
+            # also skip the run of seq nums that already arrived out of order
+            bits = flow.oooBits >> 1
+            run = (~bits & (bits + 1)).bit_length() - 1  # number of trailing 1 bits
+            flow.oooNext = ne + 1 + run
+            flow.oooBits = bits >> run
             return False
 
         if seq < ne:
             return False
 
         # Out-of-order (first time for this early seq)
-        if seq not in oset:
-            oset.add(seq)
-            self.reordering_cnt[key] += 1
-            self._reorder_events_outbox[key].append((ne, seq, pkt.priority))  # ← store (next_expected, received)
-            return True
-
-        return False
-    
-    def runHost(self, currTimeslot, flowLogFile, ackQueues, totalPktSent, totalPktRecvd, totalFlowsFinished):
+        offset = seq - ne
+        if offset < self.oooWindow:
+            if flow.oooBits >> offset & 1:
+                return False
+            flow.oooBits |= 1 << offset
+        flow.numReordered += 1
+        self.reorderSink.record(self.addr, self._key(pkt), ne, seq, pkt.priority)
+        return True
+
+    def runHost(self, currTimeslot, ackQueues, totalPktSent, totalPktRecvd, totalFlowsFinished, outstandingFlows):
         """Main loop of host"""
 
         self.sendPacket(currTimeslot, totalPktSent)  # in each timeslot, send a
                                                      # packet (if any) out on the link
 
-        self.handleRecvdAcks(ackQueues[self.addr], totalFlowsFinished,currTimeslot)  # handle received ACKs
-
-        if self.link:  # in each timeslot, receive a
-                       # packet (if any) from the link
-                       # and handle it
-            packet = self.link.recv(self.addr, currTimeslot)
-            if packet:
-                if packet.dstAddr != self.addr:
-                    sys.stdout.write("Routing Error: Packet with dst " + packet.dstAddr + " was received at " + self.addr + "\n")
-                    return
-                packet.route.append((packet.node, packet.entryTimeslot, '-'))
-                self.logPacket(packet)
-
-                if packet.ackFlag == 0:
-                    if (packet.srcAddr,packet.srcPort,packet.dstPort) not in self.rFlows:
-                        pass
-                    elif packet.seqNum < self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2]:
-                        pass
-                    elif packet.seqNum == self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2]:
-                        totalPktRecvd[0] += 1
-                        if packet.seqNum == self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][1] - 1: # last packet
-                            timeLastPktSent = int(packet.route[0][2])
-                            self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][4] = timeLastPktSent
-                        self.handleRecvdPacket(packet, ackQueues,currTimeslot)
-                        self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2] += 1
-                        self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][5] = 0
-                        # log finished flow
-                        Id = self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][0]
-                        flowsize = self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][1]
-                        starttime = self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][3]
-                        timeLastPktSent = self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][4]
-                        if self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2] == flowsize:
-                            flowLogFile.write(str(Id) + ", ")
-                            flowLogFile.write("src: " + packet.srcAddr + ", dst: " + packet.dstAddr)
-                            flowLogFile.write(", sport: " + str(packet.srcPort) + ", dport: " + str(packet.dstPort))
-                            flowLogFile.write(", flowsize: " + str(flowsize))
-                            flowLogFile.write(", starttime: " + str(starttime))
-                            flowLogFile.write(", finishtime: " + str(currTimeslot))
-                            fct = currTimeslot - starttime
-                            flowLogFile.write(", fct: " + str(fct))
-                            recvTput = (flowsize * 1500 * 8)/(fct * 120.0)
-                            flowLogFile.write(", recvtput: " + str(round(recvTput,2)) + " Gbps")
-                            assert(timeLastPktSent >= starttime)
-                            timeToSendFlow = timeLastPktSent - starttime + 1
-                            sendTput = (flowsize * 1500 * 8)/(timeToSendFlow * 120.0)
-                            flowLogFile.write(", sendtput: " + str(round(sendTput,2)) + " Gbps")
-                            flowLogFile.write("\n\n")
-                            flowLogFile.flush()
-                            # delete finished flow
-                            del self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)]
-                    elif packet.seqNum > self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2]:
-                        self.on_packet(packet) 
-                    elif self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][5] == 0:
-                        self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][5] = 1
-                        ackPacket = Packet(packet.dstAddr, packet.srcAddr, packet.dstPort, packet.srcPort, 0, self.rFlows[(packet.srcAddr,packet.srcPort,packet.dstPort)][2], 1, packet.ecnFlag)
-                        ackQueues[packet.srcAddr].put(ackPacket)
-        return self.reordering_cnt,self._reorder_events_outbox
+        self.handleRecvdAcks(ackQueues[self.id], totalFlowsFinished,currTimeslot)  # handle received ACKs
+
+        while self.ackTimers and self.ackTimers[0][0] <= currTimeslot:  # send the delayed ACKs that are due
+            deadline, flow = self.ackTimers.popleft()
+            if flow.unacked and flow.ackDeadline == deadline:
+                self.sendAck(flow, flow.nextExpected, flow.ackEcnFlag, ackQueues)
+
+        if self.inbox:  # in each timeslot, handle the
+                        # packet (if any) received on the link
+            port, packet = self.inbox.pop()
+            if packet.dstAddr != self.id:
+                sys.stdout.write("Routing Error: Packet with dst " + self.nodeNames[packet.dstAddr] + " was received at " + self.addr + "\n")
+                return
+            if packet.route is not None:
+                packet.route.append((packet.node, packet.entryTimeslot, None))
+            if self.packetLog is not None:
+                self.packetLog.write(self.id, packet)
+
+            if packet.ackFlag == 0:
+                flow = self.recvFlows[packet.flowId]
+                if flow is None:
+                    pass
+                elif packet.seqNum < flow.nextExpected:
+                    if flow.unacked:  # a retransmission, the sender may be waiting for the pending ACK
+                        self.sendAck(flow, flow.nextExpected, flow.ackEcnFlag, ackQueues)
+                elif packet.seqNum == flow.nextExpected:
+                    totalPktRecvd[0] += 1
+                    if packet.seqNum == flow.size - 1: # last packet
+                        flow.timeLastPktSent = packet.sendTimeslot
+                    self.handleRecvdPacket(packet, ackQueues,currTimeslot)
+                    flow.nextExpected += 1
+                    flow.dupAckSent = 0
+                    # record finished flow
+                    if flow.nextExpected == flow.size:
+                        self.flowTable.flowRecords.record(flow.Id, packet.srcAddr, self.id, packet.srcPort, packet.dstPort, flow.size,
+                                                          flow.startTime, currTimeslot, flow.timeLastPktSent)
+                        # delete finished flow
+                        self.flowTable.removeRecv(self.id, packet.flowId)
+                        outstandingFlows[0] -= 1
+                elif packet.seqNum > flow.nextExpected:
+                    self.on_packet(flow, packet)
+                    if flow.unacked:  # a packet was lost, do not hold back the ACK of the ones before it
+                        self.sendAck(flow, flow.nextExpected, flow.ackEcnFlag, ackQueues)
+                elif flow.dupAckSent == 0:
+                    flow.dupAckSent = 1
+                    ackPacket = self.packetPool.get(packet.dstAddr, packet.srcAddr, packet.dstPort, packet.srcPort, 0, flow.nextExpected, 1, packet.ecnFlag)
+                    ackPacket.flowId = packet.flowId
+                    ackQueues[packet.srcAddr].append(ackPacket)
+                    self.activeHosts.wake(self.nodeNames[packet.srcAddr])
+            self.packetPool.release(packet)  # the data packet has been delivered
 
     def sendPacket(self, currTimeslot, totalPktSent):
         """Strict-priority scheduler with RR within each priority."""
 
-        if len(self.rrSched) > 0:
-            dst = "0"
-            sport = 0
-            dport = 0
-
-            i = 0
-            schedFlow = 0
-            while i < len(self.rrSched):
-                i += 1
-                dst, sport, dport = self.rrSched[self.rrPointer]
-                if self.numPktSentInCurrWin[(dst,sport,dport)] < self.cwnd[(dst,sport,dport)] and self.sFlows[(dst,sport,dport)][1] < self.sFlows[(dst,sport,dport)][0]:
-                    schedFlow = 1
-                    if self.numPktSentInCurrWin[(dst,sport,dport)] == 0:
-                        self.numAckRecvdInCurrWin[(dst,sport,dport)] = 0
-                        self.numECNAckRecvdInCurrWin[(dst,sport,dport)] = 0
-                    break
-                elif currTimeslot - self.sFlows[(dst,sport,dport)][3] >= self.RTO: # timer expired
-                    self.sFlows[(dst,sport,dport)][1] = self.sFlows[(dst,sport,dport)][2]
-                    self.numPktSentInCurrWin[(dst,sport,dport)] = self.numAckRecvdInCurrWin[(dst,sport,dport)]
-                    assert(self.numPktSentInCurrWin[(dst,sport,dport)] >= 0)
-                    #print("Timer expired!")
-                else:
-                    self.rrPointer = (self.rrPointer + 1) % len(self.rrSched)
+        while self.rtoTimers and self.rtoTimers[0][0] <= currTimeslot:
+            expiry, flow = self.rtoTimers.popleft()
+            if self.timerArmed(flow, expiry):
+                self.expiredFlows[flow] = None
+
+        for flow in self.expiredFlows:
+            if not flow.canSend(): # timer expired
+                flow.nextSeq = flow.lastAck
+                flow.numPktSentInCurrWin = flow.numAckRecvdInCurrWin
+                assert(flow.numPktSentInCurrWin >= 0)
+                #print("Timer expired!")
+                self.updateReady(flow)
+
+        for ready in self.ready:  # priority 1 first
+            while ready:
+                flow = ready.popleft()
+                if not flow.canSend():  # the window shrank or the flow finished after it was listed
+                    flow.listed = False
+                    continue
+                if flow.numPktSentInCurrWin == 0:
+                    flow.numAckRecvdInCurrWin = 0
+                    flow.numECNAckRecvdInCurrWin = 0
 
-            
-            if schedFlow == 1:
                 # Send exactly one packet
-                seqNum = self.sFlows[(dst, sport, dport)][1]
-                packet = Packet(self.addr, dst, sport, dport, seqNum, 0, 0, 0)
-                packet.priority = self.priority[(dst, sport, dport)]
+                packet = self.packetPool.get(self.id, flow.dst, flow.sport, flow.dport, flow.nextSeq, 0, 0, 0)
+                packet.priority = flow.priority
+                packet.flowId = flow.flowId
+                packet.ecmpHash = flow.ecmpHash
+                if self.routeTracer is not None and self.routeTracer.traced(self.addr, self.nodeNames[flow.dst], flow.sport, flow.dport):
+                    packet.route = []
                 self.link.send(packet, self.addr, currTimeslot)
-                # if packet.dstAddr == 'h1' and packet.srcAddr == 'h140':
-                #     print(currTimeslot)
-                #     breakpoint()
-                if packet.dstAddr == '1' and packet.dstPort == 157:
-                    print(f"sending packet to {packet.dstAddr} and seq_num = {packet.seqNum}")
-                    print(f"numPacketsentInCurrWin = {self.numPktSentInCurrWin[(dst, sport, dport)]} , cwnd = {self.cwnd[(dst, sport, dport)]} ")
-                    print(f"time = {currTimeslot}")
-                    #breakpoint()
-                self.sFlows[(dst, sport, dport)][1] += 1
-                self.sFlows[(dst, sport, dport)][3] = currTimeslot  # (re)set timer
+                if flow.tracer is not None:
+                    flow.tracer.sentPacket(currTimeslot, self, flow, packet)
+                flow.nextSeq += 1
+                flow.timer = currTimeslot  # (re)set timer
+                self.rtoTimers.append((currTimeslot + self.RTO, flow))
+                self.expiredFlows.pop(flow, None)
                 totalPktSent[0] += 1
-                self.numPktSentInCurrWin[(dst, sport, dport)] += 1
+                flow.numPktSentInCurrWin += 1
 
-                # Advance pointer so RR within the same priority progresses
-                self.rrPointer = (self.rrPointer + 1) % len(self.rrSched)
+                # Back of the list so RR within the same priority progresses,
+                # unless the window is full or all data has been sent
+                if flow.canSend():
+                    ready.append(flow)
+                else:
+                    flow.listed = False
                 return
 
 
+    def startFlow(self, flowId, dst, sport, dport, size, priority, ecmpHash, tracer=None):
+        """Start sending flow flowId of size packets to the host with node ID dst.
+           ecmpHash is the ECMP hash of its data packets.
+           tracer is the Tracer of the flow, None if it is not traced"""
+        flow = SendFlow(flowId, dst, sport, dport, size, priority, ecmpHash, tracer)
+        self.flowTable.addSend(self.id, flow)
+        self.updateReady(flow)
+
+
+    def trackedFlows(self):
+        """Returns the number of flow records held for this host"""
+        return self.flowTable.numTracked[self.id]
+
+
+    def trackedBytes(self):
+        """Returns the size of the flow records held for this host (in bytes)"""
+        return self.flowTable.bytesTracked[self.id]
+
+
+    def timerArmed(self, flow, expiry):
+        """Returns True if the timer of flow expiring in timeslot expiry is not stale"""
+        return not flow.finished and flow.timer + self.RTO == expiry
+
+
+    def updateReady(self, flow):
+        """List flow as ready in its priority class if it can send and is not listed yet.
+           A finished flow cannot send, so it is never listed again"""
+        if not flow.listed and flow.canSend():
+            flow.listed = True
+            self.ready[flow.priority - 1].append(flow)
+
+
+    def nextSendTimeslot(self, currTimeslot):
+        """Returns the earliest timeslot >= currTimeslot in which the host has
+           something to do on its own: a flow that can send, a flow whose
+           retransmission timer expires, or a delayed ACK that is due.
+           Returns None if none is pending"""
+        if any(self.ready) or self.expiredFlows:
+            return currTimeslot
+        nextTimeslot = None
+        while self.rtoTimers:
+            expiry, flow = self.rtoTimers[0]
+            if self.timerArmed(flow, expiry):
+                nextTimeslot = max(expiry, currTimeslot)
+                break
+            self.rtoTimers.popleft()
+        while self.ackTimers:
+            deadline, flow = self.ackTimers[0]
+            if flow.unacked and flow.ackDeadline == deadline:
+                if nextTimeslot is None or deadline < nextTimeslot:
+                    nextTimeslot = max(deadline, currTimeslot)
+                break
+            self.ackTimers.popleft()
+        return nextTimeslot
+
+
     def handleRecvdPacket(self, packet, ackQueues,currTimeslot):
-        """Handle the packet received on the link
+        """Handle the in-order packet received on the link
            and send an ack packet for the received packet
-           by enqueuing the ack packet into the right ackQueue"""
-        ackPacket = Packet(packet.dstAddr, packet.srcAddr, packet.dstPort, packet.srcPort, 0, packet.seqNum+1, 1, packet.ecnFlag)
-        ackQueues[packet.srcAddr].put(ackPacket)
-        self.on_packet(packet)
-        
+           by enqueuing the ack packet into the right ackQueue.
+           With delayed ACKs, the packet is acked with the next ones"""
+        flow = self.recvFlows[packet.flowId]
+        if flow.unacked and packet.ecnFlag != flow.ackEcnFlag:
+            # a cumulative ACK only covers packets with the same ECN flag,
+            # so that the sender still counts the marked packets exactly
+            self.sendAck(flow, packet.seqNum, flow.ackEcnFlag, ackQueues)
+        flow.unacked += 1
+        flow.ackEcnFlag = packet.ecnFlag
+        if flow.unacked == self.delayedAck or packet.seqNum == flow.size - 1:
+            self.sendAck(flow, packet.seqNum+1, packet.ecnFlag, ackQueues)
+        elif flow.unacked == 1:
+            flow.ackDeadline = currTimeslot + self.ackDelay
+            self.ackTimers.append((flow.ackDeadline, flow))
+        self.on_packet(flow, packet)
+        if flow.tracer is not None:
+            flow.tracer.recvdPacket(currTimeslot, self, packet)
+
+
+    def sendAck(self, flow, ackNum, ecnFlag, ackQueues):
+        """Send an ack of the packets of flow, a RecvFlow, up to ackNum (exclusive)
+           by enqueuing it into the ackQueue of the flow's source"""
+        ackPacket = self.packetPool.get(self.id, flow.src, flow.dport, flow.sport, 0, ackNum, 1, ecnFlag)
+        ackPacket.flowId = flow.flowId
+        ackQueues[flow.src].append(ackPacket)
+        self.activeHosts.wake(self.nodeNames[flow.src])
+        flow.unacked = 0
 
 
     def handleRecvdAcks(self, ackQueue, totalFlowsFinished,currTimeslot):
-        """Handle the received acks"""
-        while not ackQueue.empty():
-            ackPacket = ackQueue.get()
+        """Handle the acks received since the last timeslot, in one pass"""
+        if not ackQueue:
+            return
+        sendFlows = self.sendFlows
+        for ackPacket in ackQueue:
             assert(ackPacket.ackFlag == 1)
 
             # log recvd ACKs
-            self.logPacket(ackPacket)
-
-            dst = ackPacket.srcAddr
-            sport = ackPacket.dstPort
-            dport = ackPacket.srcPort
-
-            assert(ackPacket.ackNum == self.sFlows[(dst,sport,dport)][2] or ackPacket.ackNum == self.sFlows[(dst,sport,dport)][2]+1)
-
-            if ackPacket.ackNum == self.sFlows[(dst,sport,dport)][2]+1:
-                self.sFlows[(dst,sport,dport)][2] += 1
-                # if ackPacket.dstAddr == 'h13' and ackPacket.srcPort == 943 and ackPacket.dstPort == 943:
-                #     print(currTimeslot)
-                #     breakpoint()
-                if (dst,sport,dport) in self.rrSched: # the flow exists
-                    self.numPktSentInCurrWin[(dst,sport,dport)] -= 1
-                    assert(self.numPktSentInCurrWin[(dst,sport,dport)] >= 0)
-                    self.numAckRecvdInCurrWin[(dst,sport,dport)] += 1
+            if self.packetLog is not None:
+                self.packetLog.write(self.id, ackPacket)
+
+            flow = sendFlows[ackPacket.flowId]
+            assert(ackPacket.ackNum >= flow.lastAck)
+
+            if ackPacket.ackNum > flow.lastAck:
+                # a delayed ACK acks several packets, all with its ECN flag
+                while flow.lastAck < ackPacket.ackNum:
+                    flow.lastAck += 1
+                    flow.numPktSentInCurrWin -= 1
+                    assert(flow.numPktSentInCurrWin >= 0)
+                    flow.numAckRecvdInCurrWin += 1
                     if (ackPacket.ecnFlag == 1):
-                        self.numECNAckRecvdInCurrWin[(dst,sport,dport)] += 1
-                    if self.numAckRecvdInCurrWin[(dst,sport,dport)] == self.cwnd[(dst,sport,dport)]: # received all the acks for curr window of sent data
+                        flow.numECNAckRecvdInCurrWin += 1
+                    if flow.numAckRecvdInCurrWin == flow.cwnd: # received all the acks for curr window of sent data
                         # Update the cwnd value below according to DCTCP algorithm
-                        F = self.numECNAckRecvdInCurrWin[(dst,sport,dport)] / self.numAckRecvdInCurrWin[(dst,sport,dport)]
+                        F = flow.numECNAckRecvdInCurrWin / flow.numAckRecvdInCurrWin
                         if F == 0:
-                            self.cwnd[(dst,sport,dport)] += 1
+                            flow.cwnd += 1
                         else:
-                            self.alpha[(dst,sport,dport)] = 0.25 * self.alpha[(dst,sport,dport)] + 0.75 * F
-                            assert(self.alpha[(dst,sport,dport)] >= 0 and self.alpha[(dst,sport,dport)] <= 1)
-                            self.cwnd[(dst,sport,dport)] = math.ceil(self.cwnd[(dst,sport,dport)] * (1 - (self.alpha[(dst,sport,dport)]/2)))
+                            flow.alpha = 0.25 * flow.alpha + 0.75 * F
+                            assert(flow.alpha >= 0 and flow.alpha <= 1)
+                            flow.cwnd = math.ceil(flow.cwnd * (1 - (flow.alpha/2)))
                         # reset the values at the end
-                        self.numAckRecvdInCurrWin[(dst,sport,dport)] = 0
-                        self.numECNAckRecvdInCurrWin[(dst,sport,dport)] = 0
-            elif ackPacket.ackNum == self.sFlows[(dst,sport,dport)][2]: # dup ack
-                self.sFlows[(dst,sport,dport)][1] = self.sFlows[(dst,sport,dport)][2]
-                self.numPktSentInCurrWin[(dst,sport,dport)] = self.numAckRecvdInCurrWin[(dst,sport,dport)]
-                assert(self.numPktSentInCurrWin[(dst,sport,dport)] >= 0)
+                        flow.numAckRecvdInCurrWin = 0
+                        flow.numECNAckRecvdInCurrWin = 0
+            else: # dup ack
+                flow.nextSeq = flow.lastAck
+                flow.numPktSentInCurrWin = flow.numAckRecvdInCurrWin
+                assert(flow.numPktSentInCurrWin >= 0)
                 #print("Dup ack recvd!")
 
+            self.packetPool.release(ackPacket)  # the ACK has been consumed
+
             """delete scheduled flow if acks for all packets from the flow have been received"""
-            if self.sFlows[(dst,sport,dport)][0] == self.sFlows[(dst,sport,dport)][2]:
-                del self.sFlows[(dst,sport,dport)]
-                del self.cwnd[(dst,sport,dport)]
-                del self.alpha[(dst,sport,dport)]
-                del self.numPktSentInCurrWin[(dst,sport,dport)]
-                self.rrSched.remove((dst,sport,dport))
-                if self.rrPointer >= len(self.rrSched):
-                    self.rrPointer = 0
-                if self.priority[(dst,sport,dport)] == 3:
+            if flow.size == flow.lastAck:
+                self.flowTable.removeSend(self.id, flow.flowId)
+                flow.finished = True
+                self.expiredFlows.pop(flow, None)
+                if flow.priority == 3:
                     totalFlowsFinished[0] += 1
-                if self.priority[(dst,sport,dport)] == 1:
+                if flow.priority == 1:
                     totalFlowsFinished[1] += 1
                 # print(f"flows left = {len(self.rrSched)}:{self.addr}")
                     # message = f"flow completion time for {(dst,sport,dport)} = {currTimeslot} \n" 
                     # with open("/home/dan/LQD/obm-sim/obm-sim/short_flow_completion_time_abm.txt", "a") as f:
                     #     f.write(message)
                     # print(f"flow completion time = {currTimeslot}")
+
+            # an ACK may open the window or rewind the flow; checked once finished is set,
+            # so that the last ACK of a flow rewound by a timeout does not list it again
+            self.updateReady(flow)
                     
+        ackQueue.clear()
 
         
@@ -0,0 +1,97 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import argparse
+import os
+import json
+import struct
+from routetrace import formatRoute
+
+MAGIC = b"OBMPKTLOG1\n"
+HEADER = struct.Struct("<I")                # length of the JSON header that follows
+RECORD = struct.Struct("<IIIIIIIBBH")       # receiving host ID, src, dst, sport, dport, seqNum, ackNum,
+                                            # ackFlag, ecnFlag, number of route hops that follow
+HOP = struct.Struct("<Iqq")                 # node ID, entry timeslot, exit timeslot (-1 if missing)
+
+class PacketLog:
+    """Binary log of the packets received by all hosts.
+
+       Every packet is one fixed-width record, followed by the hops of its route
+       if it recorded one, written through a large buffer. readPacketLog renders
+       the records in the text format of the per-host packet logs"""
+
+    def __init__(self, path, nodeNames, numHosts, bufferSize=1 << 20):
+        """Create the log at path. nodeNames maps node IDs to names; the first
+           numHosts of them are the hosts"""
+        self.f = open(path, "wb", buffering=bufferSize)
+        header = json.dumps({"nodeNames": nodeNames, "numHosts": numHosts}).encode()
+        self.f.write(MAGIC)
+        self.f.write(HEADER.pack(len(header)))
+        self.f.write(header)
+
+
+    def write(self, hostId, packet):
+        """Append packet, received at host hostId"""
+        route = packet.route
+        self.f.write(RECORD.pack(hostId, packet.srcAddr, packet.dstAddr, packet.srcPort, packet.dstPort,
+                                 packet.seqNum, packet.ackNum, packet.ackFlag, packet.ecnFlag,
+                                 0 if route is None else len(route)))
+        if route:
+            for node, entry, exit in route:
+                self.f.write(HOP.pack(node, -1 if entry is None else entry, -1 if exit is None else exit))
+
+
+    def close(self):
+        self.f.close()
+
+
+def readPacketLog(path):
+    """Returns (nodeNames, numHosts, lines) for the log at path, where lines
+       is a list of (receiving host ID, text line) in the order received"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(path + " is not a packet log")
+    offset = len(MAGIC)
+    (headerLen,) = HEADER.unpack_from(data, offset)
+    offset += HEADER.size
+    header = json.loads(data[offset:offset + headerLen])
+    offset += headerLen
+    nodeNames = header["nodeNames"]
+
+    lines = []
+    while offset < len(data):
+        hostId, src, dst, sport, dport, seqNum, ackNum, ackFlag, ecnFlag, numHops = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        line = ("src: " + nodeNames[src] + ", dst: " + nodeNames[dst] + ", sport: " + str(sport) + ", dport: " + str(dport)
+                + ", seqNum: " + str(seqNum) + ", ackNum: " + str(ackNum)
+                + ", ackFlag: " + str(ackFlag) + ", ecnFlag: " + str(ecnFlag) + ", route: ")
+        if numHops:
+            route = []
+            for _ in range(numHops):
+                node, entry, exit = HOP.unpack_from(data, offset)
+                offset += HOP.size
+                route.append((node, None if entry < 0 else entry, None if exit < 0 else exit))
+            line += formatRoute(route, nodeNames)
+        lines.append((hostId, line + "\n\n"))
+    return nodeNames, header["numHosts"], lines
+
+
+def main():
+    """Writes <host>-recvd-packets.txt for every host, in the text format"""
+    parser = argparse.ArgumentParser(description="Render a packet log as one text file per host")
+    parser.add_argument("log", help="packet log (e.g., logs/recvd-packets.bin)")
+    parser.add_argument("outdir", nargs="?", help="directory of the text files (default: the log's directory)")
+    args = parser.parse_args()
+    path = args.log
+    outdir = args.outdir if args.outdir is not None else os.path.dirname(path)
+    nodeNames, numHosts, lines = readPacketLog(path)
+    files = [open(os.path.join(outdir, nodeNames[i] + "-recvd-packets.txt"), "w") for i in range(numHosts)]
+    for hostId, line in lines:
+        files[hostId].write(line)
+    for f in files:
+        f.close()
+
+
+if __name__ == "__main__":
+    main()
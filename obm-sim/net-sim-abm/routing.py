@@ -0,0 +1,91 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import hashlib
+import zlib
+
+def sha256Hash(src, dst, sport, dport):
+    """ECMP hash of the flow from host src to host dst (names) with ports sport and dport.
+       The switches have always picked the uplink with this hash"""
+    return int(hashlib.sha256((src + dst + str(sport) + str(dport)).encode('utf-8')).hexdigest(), 16)
+
+
+def crc32Hash(src, dst, sport, dport):
+    """Cheaper ECMP hash of the same flow 4-tuple; spreads flows differently than sha256Hash"""
+    return zlib.crc32((src + dst + str(sport) + str(dport)).encode('utf-8'))
+
+
+ECMP_HASHES = {"sha256": sha256Hash, "crc32": crc32Hash}
+
+def buildRoutes(switches, hosts, links):
+    """Fill the routing table of every switch from the topology: switch.routes
+       maps the node ID of every host to the tuple of ports on shortest paths
+       towards it, in port order; ECMP spreads the flows over them.
+       switches and hosts are dicts indexed by address, links the parsed links
+       {(addr1, addr2): (port1, port2, link)}. Every host has exactly one link,
+       to its edge switch.
+       switch.ecmpShift is set to 8 bits per tier above the edge switches, so
+       that the tiers pick their ports from different bits of the ECMP hash"""
+    neighbors = {addr: [] for addr in switches}  # (port, neighbor switch) by switch
+    edges = {}  # (edge switch, port) by host
+    for (addr1, addr2), (p1, p2, link) in links.items():
+        if addr1 in switches and addr2 in switches:
+            neighbors[addr1].append((p1, addr2))
+            neighbors[addr2].append((p2, addr1))
+            continue
+        host, edge = (addr1, (addr2, p2)) if addr1 in hosts else (addr2, (addr1, p1))
+        if host in edges:
+            raise ValueError("Host " + host + " has more than one link")
+        edges[host] = edge
+    for addr in neighbors:
+        neighbors[addr].sort()
+
+    # tier of every switch, 0 for the edge switches
+    edgeSwitches = sorted(set(switch for switch, port in edges.values()))
+    tiers = distances(neighbors, edgeSwitches)
+    for addr, switch in switches.items():
+        switch.ecmpShift = 8 * tiers.get(addr, 0)
+
+    # ports towards every edge switch, shared by the hosts below it
+    groups = {}  # interned tuples of ports
+    towards = {addr: {} for addr in switches}  # tuple of ports by edge switch, by switch
+    for edge in edgeSwitches:
+        dist = distances(neighbors, [edge])
+        for addr in switches:
+            if addr == edge or addr not in dist:
+                continue
+            hops = dist[addr] - 1
+            ports = tuple(port for port, neighbor in neighbors[addr] if dist.get(neighbor) == hops)
+            towards[addr][edge] = groups.setdefault(ports, ports)
+
+    below = {edge: [] for edge in edgeSwitches}  # (host ID, port) by edge switch
+    for host, (edge, port) in edges.items():
+        below[edge].append((hosts[host].id, port))
+    for addr, switch in switches.items():
+        switch.routes = routes = [None] * len(hosts)
+        for edge, hostPorts in below.items():
+            if addr == edge:
+                for hostId, port in hostPorts:
+                    routes[hostId] = groups.setdefault((port,), (port,))
+                continue
+            if edge not in towards[addr]:
+                raise ValueError("No route from " + addr + " to edge switch " + edge)
+            ports = towards[addr][edge]
+            for hostId, port in hostPorts:
+                routes[hostId] = ports
+
+
+def distances(neighbors, sources):
+    """Returns the number of hops from the nearest of sources to every switch
+       reachable from them, by breadth-first search over neighbors"""
+    dist = {addr: 0 for addr in sources}
+    frontier = list(sources)
+    while frontier:
+        nextFrontier = []
+        for addr in frontier:
+            for port, neighbor in neighbors[addr]:
+                if neighbor not in dist:
+                    dist[neighbor] = dist[addr] + 1
+                    nextFrontier.append(neighbor)
+        frontier = nextFrontier
+    return dist
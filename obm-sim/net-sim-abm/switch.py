@@ -3,7 +3,6 @@
 
 import sys
 import queue
-import hashlib
 from link import Link
 import math
 import copy
@@ -16,8 +15,16 @@ class Switch():
     def __init__(self, addr, num_tor_ports, num_agg_ports, hosts_per_rack):
         """Initialize parameters"""
         self.addr = addr  # address of switch
+        self.id = None  # node ID, assigned by the network
+        self.nodeNames = None  # node names indexed by node ID, for routing and logs
+        self.packetPool = None  # dropped and pushed-out packets are released to this pool
+        self.tracer = None  # Tracer, None unless this switch is traced
+        self.routes = None  # by destination host ID, the tuple of ports that ECMP spreads the flows over
+        self.ecmpShift = 0  # the ports are picked by the ECMP hash shifted right by this many bits
         self.links = {}   # links indexed by port, i.e., {port:link, ......, port:link}
-        self.queues = {}  # list of virtual output queues (of type queue.Queue) per port
+        self.inbox = []   # packets delivered from the links in this timeslot, as (port, packet);
+                          # at most one per port, as each link carries at most one packet per timeslot
+        self.queues = {}  # list of virtual output queues (of type VOQ) per port
                           # indexed by port, i.e., {port:[queue], ......, port:[queue]}
                           # each virtual output queue is a FIFO queue of infinite size
         self.voq_rr = {}  # stores the VOQ per port to be serviced next
@@ -40,7 +47,7 @@ class Switch():
             self.N = self.ports
             self.voq_port_qsize = [[0 for i in range(self.priority_classes)] for _ in range(self.N)]
             print(num_tor_ports)
-        elif self.addr[0] == 'a':
+        elif self.addr[0] == 'a' or self.addr[0] == 'c':  # core switches are set up like aggregation switches
             self.ports = num_agg_ports
             self.total_buffer_size = self.per_port_max_qsize*num_agg_ports
             self.N = self.ports
@@ -51,13 +58,17 @@ class Switch():
         #########################################################################################################
         self.total_usage = 0 
         self.final_add = [0 for i in range(self.N)]
-        self.T = [[self.total_buffer_size/(self.ports*self.priority_classes) for _ in range(self.priority_classes)] for i in range(self.ports)]
+        self.T = [self.total_buffer_size/(self.ports*self.priority_classes) for _ in range(self.priority_classes)]  # threshold per class, the same at every port
         self.sent = 0
         self.alpha = [8,4,2]#[2,1,0.5]
         self.t = 0
         self.t_track = 0
-        self.np = [0]*self.priority_classes
+        self.np = [0]*self.priority_classes  # number of congested queues per class
+        self.T_free = None  # free buffer space the thresholds were computed for
+        self.voq_at_least = [[self.ports] + [0]*(self.total_buffer_size+1) for _ in range(self.priority_classes)]  # per class, number of ports
+                                                                                                                   # with at least n packets queued, by n
         self.bwu = [[0 for i in range(self.priority_classes)] for _ in range(self.ports)]
+        self.bwu_full = set()  # ports (from 0) with at least 100 packets sent in bwu, their nqa is due
         self.nqa = [[1 for i in range(self.priority_classes)] for _ in range(self.ports)]
         self.K = 30
     def runSwitch(self, currTimeslot):
@@ -68,40 +79,34 @@ class Switch():
                                         # at the head of a VOQ at each port.
                                         # VOQs at each port are scheduled in
                                         # round robin manner
-            flag_1 = 0
             for i in range(self.priority_classes):
-                if not self.queues[port][i].empty():
-                    for j in range(0,self.queues[port][i].qsize()):
-                        packet = self.queues[port][i].get_nowait()
-                        if packet.invalid == 0:
-                            self.bwu[port-1][packet.priority-1] += 1
-                            self.links[port].send(packet, self.addr, currTimeslot)
-                            # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
-                            # if i == 0:
-                            #     breakpoint()
-                            self.port_qsize[port] -= 1
-                            self.sent+=1
-                            self.total_usage-=1 
-                            self.voq_port_qsize[port-1][i]-=1
-                            flag_1 = 1
-                            assert(self.port_qsize[port] >= 0)
-                            break
-
-                    if flag_1:
-                        break
-
-                else:
-                    continue
-
-
-        for port in self.links.keys():  # in each timeslot, receive a
-                                        # pa cket (if any) on each input
-                                        # port and handle it
-            packet = self.links[port].recv(self.addr, currTimeslot)
-            if packet:
-                self.handleRecvdPacket(port, packet, currTimeslot)
-            else:
-                self.final_add[port-1] = 0
+                if self.queues[port][i].size:
+                    packet = self.queues[port][i].pop()
+                    self.bwu[port-1][packet.priority-1] += 1
+                    if sum(self.bwu[port-1]) >= 100:
+                        self.bwu_full.add(port-1)
+                    self.links[port].send(packet, self.addr, currTimeslot)
+                    # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
+                    # if i == 0:
+                    #     breakpoint()
+                    self.port_qsize[port] -= 1
+                    self.sent+=1
+                    self.total_usage-=1 
+                    self.voq_port_qsize[port-1][i]-=1
+                    self.voq_at_least[i][self.voq_port_qsize[port-1][i]+1] -= 1
+                    assert(self.port_qsize[port] >= 0)
+                    break
+
+
+        self.final_add = [0] * self.N  # only ports with an arrival in this timeslot are set below
+        self.inbox.sort(key=lambda arrival: arrival[0])
+        if self.tracer is not None:
+            for port, packet in self.inbox:
+                self.tracer.switchRecvd(currTimeslot, self, port, packet)
+        for port, packet in self.inbox:  # in each timeslot, handle the packets
+                                         # received on the input ports, in port order
+            self.handleRecvdPacket(port, packet, currTimeslot)
+        self.inbox = []
         
         #if self.t > self.t_track:
         #    self.t_track+=200
@@ -112,65 +117,57 @@ class Switch():
 
 
         
+    def isIdle(self):
+        """Returns True if nothing is queued at the switch, i.e., runSwitch has
+           nothing to do until a packet arrives on one of its links"""
+        if self.total_usage > 0:
+            return False
+        for port in self.queues:
+            for i in range(self.priority_classes):
+                if self.queues[port][i].size:
+                    return False
+        return True
+
+
     def setECNFlag(self, packet, outPort):
         if self.port_qsize[outPort] > self.K:
             packet.ecnFlag = 1
 
 
-    def ecmp(self, packet):
-        flowid = packet.srcAddr + packet.dstAddr + str(packet.srcPort) + str(packet.dstPort)
-        outPort = int(hashlib.sha256(flowid.encode('utf-8')).hexdigest(), 16) % (self.num_tor_ports - self.hosts_per_rack) + (self.hosts_per_rack + 1)
-        return outPort
-
-
-    def getOutPort(self, switchId, packet):
-        if switchId[0] == 't':
-            if int(packet.dstAddr[1:]) >= int(switchId[1])*16-15 and int(packet.dstAddr[1:]) <= int(switchId[1])*16:
-                return int(packet.dstAddr[1:])-((int(switchId[1])-1)*16)
-            else:
-                return self.ecmp(packet)
-        elif switchId[0] == 'a':
-            return int((int(packet.dstAddr[1:])-1)/16)+1
+    def getOutPort(self, packet):
+        """Returns the output port of packet: the port towards its destination in
+           the routing table, picked by the packet's ECMP hash if there are several"""
+        ports = self.routes[packet.dstAddr]
+        if len(ports) == 1:
+            return ports[0]
+        return ports[(packet.ecmpHash >> self.ecmpShift) % len(ports)]
         
 ######################################################################## Additional ######################################################################################
 
     def threshold_calculate(self): # Threshold calculation for ABM - takes alpha into total alpha calculation only if the queue size is > 0 
-        self.np = [0]*self.priority_classes
-        #self.nqa = 1/3
+        """Count the congested queues of every class, those holding at least 0.9 times
+           the threshold, and recompute the thresholds whose count or free buffer space changed.
+           The counts are read from voq_at_least, so this does not depend on the number of ports"""
+        free = self.total_buffer_size - self.total_usage
         for n2 in range(self.priority_classes):
-            for n1 in range(self.ports):
-                if self.voq_port_qsize[n1][n2] >= 0.9*self.T[n1][n2]:
-                    self.np[n2]+=1
-                # if self.voq_port_qsize[n1][n2] >= 1:
-                #     self.nqa[n1] += 1
-        # for n1 in range(self.ports):
-        #     if self.nqa[n1] == 0:
-        #         self.nqa[n1] = 4    
-        for n1 in range(self.ports):
-            if sum(self.bwu[n1]) >= 100:
-                for n2 in range(self.priority_classes):
-                    self.nqa[n1][n2] = self.bwu[n1][n2]/sum(self.bwu[n1])
-                    if self.bwu[n1][n2] < 30:
-                        self.nqa[n1][n2] = 1/3
-                self.bwu[n1] = [0]*self.priority_classes
-                
-
-        
-        # for n1 in range(self.ports):
-        #     if sum(self.bwu[n1]) >= 10:
-        #         for n2 in range(self.priority_classes):
-        #             self.nqa[n1][n2] = self.bwu[n1][n2]/sum(self.bwu[n1])
-                     
-        #             if self.bwu[n1][n2] < 1:
-        #                 self.nqa[n1][n2] = 1/10
-                        
-        #         self.bwu[n1] = [0]*self.priority_classes
+            at_least = self.voq_at_least[n2]
+            n = math.ceil(0.9*self.T[n2])  # the queue lengths are integers
+            np = at_least[n] if n < len(at_least) else 0
+            if np != self.np[n2] or free != self.T_free:
+                self.np[n2] = np
+                if np==0:
+                    self.T[n2]= self.alpha[n2]*free*(1/3)#(self.nqa[n1][n2])
+                else:
+                    self.T[n2]= self.alpha[n2]*free*(1/3)*(1/np)#(self.nqa[n1][n2])*(1/self.np[n2])
+        self.T_free = free
 
+        for n1 in self.bwu_full:
             for n2 in range(self.priority_classes):
-                if self.np[n2]==0:
-                    self.T[n1][n2]= self.alpha[n2]*(self.total_buffer_size - self.total_usage)*(1/3)#(self.nqa[n1][n2])
-                else:
-                    self.T[n1][n2]= self.alpha[n2]*(self.total_buffer_size - self.total_usage)*(1/3)*(1/self.np[n2])#(self.nqa[n1][n2])*(1/self.np[n2])
+                self.nqa[n1][n2] = self.bwu[n1][n2]/sum(self.bwu[n1])
+                if self.bwu[n1][n2] < 30:
+                    self.nqa[n1][n2] = 1/3
+            self.bwu[n1] = [0]*self.priority_classes
+        self.bwu_full.clear()
                 
         
         
@@ -182,22 +179,23 @@ class Switch():
     def handleRecvdPacket(self, inPort, packet, arrivalTime):
         """Handle the packet received on the specified input port 'inPort'.
            arrivalTime is the timeslot in which the packet was received"""
-        outPort = self.getOutPort(self.addr, packet)  # output port the packet needs to be sent out on
+        outPort = self.getOutPort(packet)  # output port the packet needs to be sent out on
         
 ################################################################################ BIT MAPPER ########################################################################################
         if self.total_buffer_size > self.total_usage:
             
-            # self.queues[outPort][inPort-1].put(packet)  # add packet to the right VOQ at the output port
+            # self.queues[outPort][inPort-1].push(packet)  # add packet to the right VOQ at the output port
             # self.queues have their keys same as the keys for the links but the sublist has its index starting from 0, so does self.port_qsize (first index only)
             # self.voq_port_qsize have their indices starting from 0 (because it doesnt use the keys from the links)
             
-            if self.voq_port_qsize[outPort-1][packet.priority-1] < self.T[outPort-1][packet.priority-1]:
+            if self.voq_port_qsize[outPort-1][packet.priority-1] < self.T[packet.priority-1]:
                 self.final_add[inPort-1] = 1
                 self.total_usage += 1
                 
-                self.queues[outPort][packet.priority-1].put(packet)
+                self.queues[outPort][packet.priority-1].push(packet)
                 self.port_qsize[outPort] += 1
                 self.voq_port_qsize[outPort-1][packet.priority-1]+= 1
+                self.voq_at_least[packet.priority-1][self.voq_port_qsize[outPort-1][packet.priority-1]] += 1
                 self.setECNFlag(packet, outPort)
                 #print(f"voq length = {[self.voq_port_qsize[c][0] for c in range(0,self.N)]}")
                 # if packet.dstAddr == 'h13' and packet.srcPort == 943 and packet.dstPort == 943:
@@ -214,8 +212,8 @@ class Switch():
                 with open("/home/dan/LQD/obm-sim/obm-sim/drop_stats_abm.txt", "a") as f:
                     f.write(msg)
                 with open("/home/dan/LQD/obm-sim/obm-sim/short_flow_completion_time_abm.txt", "a") as f:
-                    f.write(f"dropped packet - {packet.dstAddr,packet.srcPort,packet.dstPort} - from switch - {self.addr} \n")
-                pass
+                    f.write(f"dropped packet - {self.nodeNames[packet.dstAddr],packet.srcPort,packet.dstPort} - from switch - {self.addr} \n")
+                self.packetPool.release(packet)
             
         else:
             self.final_add[inPort-1] = 0
@@ -225,7 +223,7 @@ class Switch():
             msg = f"switch {self.addr} - space constrain drop - {self.packet_dropped} \n"
             with open("/home/dan/LQD/obm-sim/obm-sim/drop_stats_abm.txt", "a") as f:
                 f.write(msg)
-            pass
+            self.packetPool.release(packet)
         
     
         self.threshold_calculate()
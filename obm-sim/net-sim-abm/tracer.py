@@ -0,0 +1,65 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+class Tracer:
+    """Debug trace of selected flows, hosts and switches.
+
+       The selection is resolved once: for a flow when it starts, for a switch
+       when the run starts. Only the selected flows and switches hold a reference
+       to the tracer, so the rest of the network runs no tracing code"""
+
+    def __init__(self, out, flows=(), hosts=(), switches=()):
+        """Write the trace to the file out. flows are "src,dst" or
+           "src,dst,sport,dport" strings; the flows from or to one of hosts
+           and the packets arriving at one of switches are traced too"""
+        self.out = out
+        self.pairs = set()  # (src, dst) of the traced flows
+        self.flows = set()  # (src, dst, sport, dport) of the traced flows
+        for spec in flows:
+            fields = [field.strip() for field in spec.split(",")]
+            if len(fields) == 2:
+                self.pairs.add((fields[0], fields[1]))
+            elif len(fields) == 4:
+                self.flows.add((fields[0], fields[1], int(fields[2]), int(fields[3])))
+            else:
+                raise ValueError("Flow to trace should be src,dst or src,dst,sport,dport: " + spec)
+        self.hosts = set(hosts)
+        self.switches = set(switches)
+
+
+    def tracesFlow(self, src, dst, sport, dport):
+        """Returns True if the flow from host src to host dst is traced"""
+        return (src in self.hosts or dst in self.hosts or (src, dst) in self.pairs
+                or (src, dst, sport, dport) in self.flows)
+
+
+    def tracesSwitch(self, addr):
+        """Returns True if the switch addr is traced"""
+        return addr in self.switches
+
+
+    def write(self, currTimeslot, addr, event):
+        """Write event, which happened at node addr in currTimeslot"""
+        self.out.write(str(currTimeslot) + " " + addr + ": " + event + "\n")
+
+
+    def sentPacket(self, currTimeslot, host, flow, packet):
+        """Trace the data packet of flow, a SendFlow, sent by host"""
+        self.write(currTimeslot, host.addr, "sent packet to " + host.nodeNames[packet.dstAddr]
+                   + " sport " + str(packet.srcPort) + " dport " + str(packet.dstPort) + " seqNum " + str(packet.seqNum)
+                   + " numPktSentInCurrWin " + str(flow.numPktSentInCurrWin) + " cwnd " + str(flow.cwnd))
+
+
+    def recvdPacket(self, currTimeslot, host, packet):
+        """Trace the in-order data packet received by host"""
+        self.write(currTimeslot, host.addr, "received packet from " + host.nodeNames[packet.srcAddr]
+                   + " sport " + str(packet.srcPort) + " dport " + str(packet.dstPort) + " seqNum " + str(packet.seqNum)
+                   + " priority " + str(packet.priority))
+
+
+    def switchRecvd(self, currTimeslot, switch, port, packet):
+        """Trace the packet arriving at port of switch"""
+        self.write(currTimeslot, switch.addr, "received on port " + str(port) + " from " + switch.nodeNames[packet.srcAddr]
+                   + " to " + switch.nodeNames[packet.dstAddr] + " sport " + str(packet.srcPort)
+                   + " dport " + str(packet.dstPort) + " seqNum " + str(packet.seqNum) + " ackNum " + str(packet.ackNum)
+                   + " ackFlag " + str(packet.ackFlag))
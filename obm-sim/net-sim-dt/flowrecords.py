@@ -0,0 +1,71 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import os
+import numpy as np
+
+FLOW_DTYPE = np.dtype([
+    ("id", np.int64),           # flow Id in the flowtrace
+    ("src", np.int32),          # node ID of the source host
+    ("dst", np.int32),          # node ID of the destination host
+    ("sport", np.int32),        # source port value
+    ("dport", np.int32),        # destination port value
+    ("size", np.int64),         # flow size (in number of packets)
+    ("start", np.int64),        # flow start timeslot
+    ("finish", np.int64),       # timeslot the last packet was received in
+    ("fct", np.int64),          # flow completion time (in timeslots)
+    ("sendtput", np.float64),   # send throughput (in Gbps), from the start to the send of the last packet
+    ("recvtput", np.float64),   # receive throughput (in Gbps), over the fct
+])
+
+class FlowRecords:
+    """Completed flows of a run, one row of preallocated NumPy columns per flow
+       in the order they finished"""
+
+    def __init__(self, numFlows):
+        """Allocate room for numFlows flows"""
+        self.rows = np.zeros(numFlows, dtype=FLOW_DTYPE)
+        self.count = 0  # number of flows recorded
+
+
+    def record(self, Id, src, dst, sport, dport, size, startTime, finishTime, timeLastPktSent):
+        """Record a flow whose last packet was sent in timeLastPktSent and received in finishTime"""
+        assert(timeLastPktSent >= startTime)
+        fct = finishTime - startTime
+        recvTput = (size * 1500 * 8)/(fct * 120.0)
+        sendTput = (size * 1500 * 8)/((timeLastPktSent - startTime + 1) * 120.0)
+        self.rows[self.count] = (Id, src, dst, sport, dport, size, startTime, finishTime, fct, sendTput, recvTput)
+        self.count += 1
+
+
+    def flows(self):
+        """Returns the structured array of the recorded flows"""
+        return self.rows[:self.count]
+
+
+def saveFlows(path, flows, nodeNames):
+    """Append the flows, a FLOW_DTYPE array, to path.npy and path.csv, which
+       like the text log collect the runs saved under the same path; the CSV
+       names the hosts, using nodeNames to map node IDs to names"""
+    lines = []
+    if not os.path.exists(path + ".csv"):
+        lines.append("id,src,dst,sport,dport,size,start,finish,fct,sendtput,recvtput\n")
+    for f in flows.tolist():
+        lines.append("%d,%s,%s,%d,%d,%d,%d,%d,%d,%r,%r\n" % ((f[0], nodeNames[f[1]], nodeNames[f[2]]) + tuple(f[3:])))
+    if os.path.exists(path + ".npy"):
+        flows = np.concatenate((np.load(path + ".npy"), flows))
+    np.save(path + ".npy", flows)
+    with open(path + ".csv", "a") as csvFile:
+        csvFile.write("".join(lines))
+
+
+def writeFlowsText(f, flows, nodeNames):
+    """Write the flows, a FLOW_DTYPE array, to the file f in the text format of the recvd-flows logs"""
+    lines = []
+    for Id, src, dst, sport, dport, size, start, finish, fct, sendTput, recvTput in flows.tolist():
+        lines.append(str(Id) + ", src: " + nodeNames[src] + ", dst: " + nodeNames[dst]
+                     + ", sport: " + str(sport) + ", dport: " + str(dport) + ", flowsize: " + str(size)
+                     + ", starttime: " + str(start) + ", finishtime: " + str(finish) + ", fct: " + str(fct)
+                     + ", recvtput: " + str(round(recvTput,2)) + " Gbps"
+                     + ", sendtput: " + str(round(sendTput,2)) + " Gbps\n\n")
+    f.write("".join(lines))
@@ -0,0 +1,70 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import numpy as np
+
+class FlowSchedule:
+    """Flow arrivals of a flowtrace, sorted by start timeslot"""
+
+    def __init__(self, flowtrace):
+        """Load the flowtrace (one header line, then one flow per line:
+           Id,src,dst,sport,dport,flowsize,starttimeslot).
+           Raises ValueError if the file is not in this format"""
+        rows = []
+        with open(flowtrace, "r") as f:
+            f.readline()
+            for line in f:
+                tokens = line.split(',')
+                if len(tokens) != 7:
+                    raise ValueError("Wrong flowtrace file format.")
+                rows.append(tokens)
+        if not rows:
+            raise ValueError("Wrong flowtrace file format.")
+
+        cols = list(zip(*rows))
+        start = np.array(cols[6], dtype=np.int64)
+        order = np.argsort(start, kind="stable")  # flows starting together keep their trace order
+        self.start = start[order]
+        self.flowIds = order  # flow IDs, the line numbers of the flows in the trace
+        self.ids = np.array(cols[0], dtype=np.int64)[order]
+        self.src = np.array([s.strip() for s in cols[1]])[order]
+        self.dst = np.array([s.strip() for s in cols[2]])[order]
+        self.sport = np.array(cols[3], dtype=np.int64)[order]
+        self.dport = np.array(cols[4], dtype=np.int64)[order]
+        self.size = np.array(cols[5], dtype=np.int64)[order]
+
+        # index from each distinct start timeslot to its flows self.start[lo:hi]
+        self.times, self.offsets = np.unique(self.start, return_index=True)
+        self.times = self.times.tolist()
+        self.offsets = self.offsets.tolist() + [len(self.start)]
+        self.next = 0  # index into self.times of the next batch to pop
+
+
+    def __len__(self):
+        return len(self.start)
+
+
+    def exhausted(self):
+        """Returns True if all flows have been popped"""
+        return self.next == len(self.times)
+
+
+    def nextStart(self):
+        """Returns the start timeslot of the next flow to pop, or None if exhausted"""
+        if self.next == len(self.times):
+            return None
+        return self.times[self.next]
+
+
+    def pop(self, currTimeslot):
+        """Returns the flows starting at or before currTimeslot that have not been
+           popped yet, as a list of (flow ID, Id, src, dst, sport, dport, flowsize, starttimeslot)"""
+        if self.next == len(self.times) or self.times[self.next] > currTimeslot:
+            return []
+        lo = self.offsets[self.next]
+        while self.next < len(self.times) and self.times[self.next] <= currTimeslot:
+            self.next += 1
+        hi = self.offsets[self.next]
+        return list(zip(self.flowIds[lo:hi].tolist(), self.ids[lo:hi].tolist(), self.src[lo:hi].tolist(), self.dst[lo:hi].tolist(),
+                        self.sport[lo:hi].tolist(), self.dport[lo:hi].tolist(), self.size[lo:hi].tolist(),
+                        self.start[lo:hi].tolist()))
@@ -4,20 +4,36 @@
 import sys
 import os
 sys.path.append(os.getcwd())
+import argparse
 import glob
-from collections import defaultdict
 import json
-import queue
 import numpy as np
+from collections import deque
 from host import Host
 from link import Link
 from switch import Switch
+from scheduler import ActiveSet
+from reordersink import ReorderSink
+from flowtrace import FlowSchedule
+from wheel import TimingWheel
+from routetrace import RouteTracer
+from packetlog import PacketLog
+from flowrecords import FlowRecords, saveFlows, writeFlowsText
+from packetpool import PacketPool
+from flow import RecvFlow
+from flowtable import FlowTable
+from tracer import Tracer
+from voq import VOQ
+from routing import ECMP_HASHES, buildRoutes
 
 class Network:
     """Network class maintains all hosts, switches, and links"""
 
-    def __init__(self, netJsonFilepath):
-        """Create a new network from the parameters in the file at netJsonFilepath"""
+    def __init__(self, netJsonFilepath, debugPacketPool=False, ecmpHash="sha256"):
+        """Create a new network from the parameters in the file at netJsonFilepath.
+           If debugPacketPool is set, packets are never recycled and any use of
+           a packet after it has been released raises a RuntimeError.
+           ecmpHash names the hash in ECMP_HASHES that spreads flows over the uplinks"""
 
         # parse configuration details
         netJsonFile = open(netJsonFilepath, 'r')
@@ -26,13 +42,42 @@ class Network:
         self.num_tor_ports = netJson["num_tor_ports"]
         self.num_agg_ports = netJson["num_agg_ports"]
         self.hosts_per_rack = netJson["hosts_per_rack"]
+        self.num_core_ports = netJson.get("num_core_ports", self.num_agg_ports)  # only 3-tier topologies have core switches
 
         # parse and create switches, hosts, and links
-        self.reordering_pairs = defaultdict(lambda: defaultdict(list))
         self.switches = self.parseswitches(netJson["switches"])
         self.hosts = self.parseHosts(netJson["hosts"])
         self.links = self.parseLinks(netJson["links"])
 
+        # node IDs carried in packets: hosts first, then switches, in the order of the
+        # network simulation file; nodeNames maps them back to addresses for logs
+        self.nodeNames = list(self.hosts) + list(self.switches)
+        for i, addr in enumerate(self.nodeNames):
+            node = self.hosts[addr] if addr in self.hosts else self.switches[addr]
+            node.id = i
+            node.nodeNames = self.nodeNames
+
+        # routing tables of the switches; a flow's ECMP hash is computed once, when it starts
+        buildRoutes(self.switches, self.hosts, self.links)
+        self.flowHash = ECMP_HASHES[ecmpHash]
+
+        # packets are recycled through a pool shared by all hosts and switches
+        self.packetPool = PacketPool(debugPacketPool)
+        for node in list(self.hosts.values()) + list(self.switches.values()):
+            node.packetPool = self.packetPool
+
+        # hosts and switches that need to be ticked in the coming timeslots
+        self.activeHosts = ActiveSet(self.hosts)
+        self.activeSwitches = ActiveSet(self.switches)
+
+        # packets in flight on the links
+        self.wheel = TimingWheel(max(link.delay for p1, p2, link in self.links.values()))
+
+        # reordering events recorded by the hosts, dumped at the end of the run
+        self.reorderSink = ReorderSink(self.hosts, self.nodeNames)
+        for h in self.hosts:
+            self.hosts[h].reorderSink = self.reorderSink
+
         netJsonFile.close()
 
 
@@ -40,7 +85,8 @@ class Network:
         """Parse switches from switchParams dict"""
         switches = {}
         for addr in switchParams:
-            switches[addr] = Switch(addr, self.num_tor_ports, self.num_agg_ports, self.hosts_per_rack)
+            numPorts = self.num_core_ports if addr[0] == 'c' else self.num_agg_ports  # ports of a non-ToR switch
+            switches[addr] = Switch(addr, self.num_tor_ports, numPorts, self.hosts_per_rack)
         return switches
 
 
@@ -65,165 +111,241 @@ class Network:
         """Add links to hosts and switches"""
         for addr1, addr2 in self.links:
             p1, p2, link = self.links[(addr1, addr2)]
+            link.wheel = self.wheel
+            link.port1 = p1
+            link.port2 = p2
             if addr1 in self.hosts:
                 self.hosts[addr1].link = link
-                self.hosts[addr1].packetLogFile = open("logs/"+addr1+"-recvd-packets.txt", "a")
+                self.hosts[addr1].activeHosts = self.activeHosts
+                link.node1 = self.hosts[addr1]
+                link.active1 = self.activeHosts
             if addr2 in self.hosts:
                 self.hosts[addr2].link = link
-                self.hosts[addr2].packetLogFile = open("logs/"+addr2+"-recvd-packets.txt", "a")
+                self.hosts[addr2].activeHosts = self.activeHosts
+                link.node2 = self.hosts[addr2]
+                link.active2 = self.activeHosts
             if addr1 in self.switches:
+                link.node1 = self.switches[addr1]
+                link.active1 = self.activeSwitches
                 self.switches[addr1].links[p1] = link
-                if addr1[0] == 't': 
-                    self.switches[addr1].queues[p1] = [queue.Queue() for _ in range(self.num_tor_ports)]
-                elif addr1[0] == 'a':
-                    self.switches[addr1].queues[p1] = [queue.Queue() for _ in range(self.num_agg_ports)]
+                self.switches[addr1].queues[p1] = [VOQ() for _ in range(self.switches[addr1].ports)]
                 self.switches[addr1].voq_rr[p1] = 0
                 self.switches[addr1].port_qsize[p1] = 0 
             if addr2 in self.switches:
+                link.node2 = self.switches[addr2]
+                link.active2 = self.activeSwitches
                 self.switches[addr2].links[p2] = link
-                if addr2[0] == 't': 
-                    self.switches[addr2].queues[p2] = [queue.Queue() for _ in range(self.num_tor_ports)]
-                elif addr2[0] == 'a':
-                    self.switches[addr2].queues[p2] = [queue.Queue() for _ in range(self.num_agg_ports)]
+                self.switches[addr2].queues[p2] = [VOQ() for _ in range(self.switches[addr2].ports)]
                 self.switches[addr2].voq_rr[p2] = 0
                 self.switches[addr2].port_qsize[p2] = 0
 
 
-    def run(self, flowtrace, endTimeslot, flowLogFile):
-        """Run the network"""
+    def printProgress(self, currTimeslot, totalPktSent, totalPktRecvd, totalFlowsFinished, outstandingFlows):
+        """Print the periodic progress line"""
+        sys.stdout.write("current timeslot: " + str(currTimeslot) + " total packets sent: " + str(totalPktSent[0]) + " total packets received: " + str(totalPktRecvd[0]) + " total flows finished: " + str(totalFlowsFinished[0]) + " flows outstanding: " + str(outstandingFlows[0]) + "\n")
+
+
+    def nextEventTimeslot(self, currTimeslot, nextFlowStart):
+        """Returns the earliest timeslot >= currTimeslot in which some host or switch
+           has work to do: a flow starts, or a host or switch is active (it can send,
+           its retransmission timer expires, an ACK is pending, it has queued packets,
+           or a packet on one of its links becomes ready).
+           Returns None if nothing will ever happen again"""
+        nextTimeslot = nextFlowStart
+        for t in (self.activeHosts.nextTimeslot(currTimeslot), self.activeSwitches.nextTimeslot(currTimeslot)):
+            if t is not None and (nextTimeslot is None or t < nextTimeslot):
+                nextTimeslot = t
+        return nextTimeslot
+
+
+    def run(self, flowtrace, endTimeslot, eventDriven=False, routeTracer=None, packetLog=None, tracer=None, delayedAck=1, oooWindow=4096):
+        """Run the network.
+           In each timeslot only the active hosts and switches are ticked.
+           If eventDriven is set, timeslots in which no host or switch is active
+           are skipped altogether. The outputs are identical to ticking every
+           host and switch in every timeslot.
+           Packets record their route only if routeTracer selects them.
+           Received packets are logged to packetLog, unless it is None.
+           The flows and switches selected by tracer, if any, are traced.
+           Receivers send one cumulative ACK per delayedAck in-order packets, and
+           remember the out-of-order arrivals up to oooWindow seq nums ahead.
+           Returns the finished flows, a FLOW_DTYPE array in the order they finished"""
         self.addLinks()
-
-        ackQueues = {}
         for h in self.hosts:
-            ackQueues[h] = queue.Queue()
+            self.hosts[h].routeTracer = routeTracer
+            self.hosts[h].packetLog = packetLog
+            self.hosts[h].delayedAck = delayedAck
+            self.hosts[h].oooWindow = oooWindow
+        for s in self.switches:
+            if tracer is not None and tracer.tracesSwitch(s):
+                self.switches[s].tracer = tracer
+
+        ackQueues = {}  # key: node ID of the host
+        for h in self.hosts:
+            ackQueues[self.hosts[h].id] = deque()
 
         currTimeslot = 0
 
         totalPktSent = [0]
         totalPktRecvd = [0]
         totalFlowsFinished = [0]
+        outstandingFlows = [0]  # flows injected but not yet fully received
 
-        f = open(flowtrace, "r")
-        line = f.readline()
-        line = f.readline()
-        tokens = line.split(',')
-        if len(tokens) != 7:
-            sys.stdout.write("Wrong flowtrace file format.\n")
+        try:
+            schedule = FlowSchedule(flowtrace)
+        except ValueError as e:
+            sys.stdout.write(str(e) + "\n")
             return
-        Id = int(tokens[0])
-        src = tokens[1]
-        dst = tokens[2]
-        sport = int(tokens[3])
-        dport = int(tokens[4])
-        flowsize = int(tokens[5])
-        startTimeslot = int(tokens[6].strip())
 
-        eof = False
+        # state of the flows in progress at their source and destination hosts, indexed by flow ID,
+        # and the metrics of the finished ones
+        flowRecords = FlowRecords(len(schedule))
+        flowTable = FlowTable(len(schedule), len(self.nodeNames), flowRecords)
+        for h in self.hosts:
+            self.hosts[h].flowTable = flowTable
+            self.hosts[h].sendFlows = flowTable.sendFlows
+            self.hosts[h].recvFlows = flowTable.recvFlows
 
         while currTimeslot < endTimeslot:
             if currTimeslot % 100 == 0:
-                sys.stdout.write("current timeslot: " + str(currTimeslot) + " total packets sent: " + str(totalPktSent[0]) + " total packets received: " + str(totalPktRecvd[0]) + " total flows finished: " + str(totalFlowsFinished[0]) + "\n")
+                self.printProgress(currTimeslot, totalPktSent, totalPktRecvd, totalFlowsFinished, outstandingFlows)
 
-            while not eof and currTimeslot == startTimeslot:
-                self.hosts[src].sFlows[(dst,sport,dport)] = [flowsize, 0, 0, 0]
+            for flowId, Id, src, dst, sport, dport, flowsize, startTimeslot in schedule.pop(currTimeslot):
+                dstId = self.hosts[dst].id
                 if flowsize < 100:
-                    self.hosts[src].priority[(dst,sport,dport)] = 1 # 1,2,3
+                    priority = 1 # 1,2,3
                 elif flowsize > 1000:
-                    self.hosts[src].priority[(dst,sport,dport)] = 3
+                    priority = 3
                 else:
-                    self.hosts[src].priority[(dst,sport,dport)] = 2
-                self.hosts[dst].rFlows[(src,sport,dport)] = [Id, flowsize, 0, startTimeslot, 0, 0]
-                self.hosts[src].rrSched.append((dst,sport,dport))
-                self.hosts[src].cwnd[(dst,sport,dport)] = 50
-                self.hosts[src].alpha[(dst,sport,dport)] = 0
-                self.hosts[src].numPktSentInCurrWin[(dst,sport,dport)] = 0
-                line = f.readline()
-                if not line:
-                    eof = True
-                    break
-                tokens = line.split(',')
-                if len(tokens) != 7:
-                    sys.stdout.write("Wrong flowtrace file format.\n")
-                    return
-                Id = int(tokens[0])
-                src = tokens[1]
-                dst = tokens[2]
-                sport = int(tokens[3])
-                dport = int(tokens[4])
-                flowsize = int(tokens[5])
-                startTimeslot = int(tokens[6].strip())
-
-            for h in self.hosts:
-                counts_delta, events = self.hosts[h].runHost(currTimeslot, flowLogFile, ackQueues, totalPktSent, totalPktRecvd, totalFlowsFinished)
-                self.reordering_pairs[h] = {fk: list(v) for fk, v in events.items()}
-            for s in self.switches:
+                    priority = 2
+                flowTracer = tracer if tracer is not None and tracer.tracesFlow(src, dst, sport, dport) else None
+                outstandingFlows[0] += 1
+                flowTable.addRecv(dstId, flowId, RecvFlow(flowId, Id, self.hosts[src].id, sport, dport, flowsize, startTimeslot, flowTracer))
+                self.hosts[src].startFlow(flowId, dstId, sport, dport, flowsize, priority,
+                                          self.flowHash(src, dst, sport, dport), flowTracer)
+                self.activeHosts.wake(src)
+
+            # push the packets arriving in this timeslot into the hosts' and switches' inboxes
+            self.wheel.deliver(currTimeslot)
+
+            # only tick the hosts and switches that have work to do in this timeslot;
+            # idle ones are woken by flow arrivals, ACKs, timers, and their links
+            for h in self.activeHosts.tick(currTimeslot):
+                self.hosts[h].runHost(currTimeslot, ackQueues, totalPktSent, totalPktRecvd, totalFlowsFinished, outstandingFlows)
+                nextTimeslot = self.hosts[h].nextSendTimeslot(currTimeslot + 1)
+                if nextTimeslot == currTimeslot + 1:
+                    self.activeHosts.wake(h)
+                elif nextTimeslot is not None:
+                    self.activeHosts.wake(h, nextTimeslot)
+            for s in self.activeSwitches.tick(currTimeslot):
                 self.switches[s].runSwitch(currTimeslot)
+                if not self.switches[s].isIdle():
+                    self.activeSwitches.wake(s)
 
             currTimeslot += 1
 
             # break if finished reading entire flowtrace file and all flows have finished
-            count = 0
-            for h in self.hosts:
-                if len(self.hosts[h].rFlows) == 0:
-                    count += 1
-            if eof and count == len(self.hosts):
+            if schedule.exhausted() and outstandingFlows[0] == 0:
                 sys.stdout.write("current timeslot: " + str(currTimeslot) + " total packets sent: " + str(totalPktSent[0]) + " total packets received: " + str(totalPktRecvd[0]) + " total flows finished: " + str(totalFlowsFinished[0]) + "\n")
                 sys.stdout.write("Ending simulation as all flows have finished.\n")
                 nwTput = (totalPktRecvd[0] * 1500 * 8.0) / (currTimeslot * 120.0)  # Assuming 100G link and 1500B packets
                 sys.stdout.write("Network throughput (assuming 100G link and 1500B pkt): " + str(round(nwTput,3)) + "Gbps\n")
                 with open("reordering_dt_per_flow.txt", "a", encoding="utf-8") as f:
-                    for h, events_by_flow in self.reordering_pairs.items():
-                        for (dst, src, dport, sport), pairs in events_by_flow.items():
-                            for item in pairs:
-                                if len(item) == 3:
-                                    ne, seq, pri = item
-                                else:  # len == 3 → (fk, ne, seq)
-                                    _, ne, seq = item
-                                f.write(f"{h},{src},{dst},{sport},{dport},{ne},{seq},{pri}\n")
-                    f.write("@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@\n")
+                    self.reorderSink.dump(f)
                 break
 
+            if eventDriven:
+                # jump to the next timeslot with work to do; the skipped timeslots
+                # would not have changed any state, only printed progress lines
+                nextTimeslot = self.nextEventTimeslot(currTimeslot, schedule.nextStart())
+                if nextTimeslot is None or nextTimeslot > endTimeslot:
+                    nextTimeslot = endTimeslot
+                for t in range(-(-currTimeslot // 100) * 100, nextTimeslot, 100):
+                    self.printProgress(t, totalPktSent, totalPktRecvd, totalFlowsFinished, outstandingFlows)
+                currTimeslot = nextTimeslot
+
         if currTimeslot >= endTimeslot:
             sys.stdout.write("current timeslot: " + str(currTimeslot) + " total packets sent: " + str(totalPktSent[0]) + " total packets received: " + str(totalPktRecvd[0]) + " total flows finished: " + str(totalFlowsFinished[0]) + "\n")
             sys.stdout.write("Ending simulation as end timeslot reached.\n")
             nwTput = (totalPktRecvd[0] * 1500 * 8.0) / (currTimeslot * 120.0)  # Assuming 100G link and 1500B packets
             sys.stdout.write("Network throughput (assuming 100G link and 1500B pkt): " + str(round(nwTput,3)) + "Gbps\n")
             with open("reordering_dt_per_flow.txt", "a", encoding="utf-8") as f:
-                    for h, events_by_flow in self.reordering_pairs.items():
-                        for (dst, src, dport, sport), pairs in events_by_flow.items():
-                            for item in pairs:
-                                if len(item) == 3:
-                                    ne, seq, pri = item
-                                else:  # len == 3 → (fk, ne, seq)
-                                    _, ne, seq = item
-                                f.write(f"{h},{src},{dst},{sport},{dport},{ne},{seq},{pri}\n")
-                    f.write("@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@\n")
-
-        for h in self.hosts:
-            self.hosts[h].packetLogFile.close()
+                self.reorderSink.dump(f)
 
-        f.close()
-        return
+        return flowRecords.flows()
 
 
 def main():
     """Main function parses command line arguments and runs the network"""
-    if len(sys.argv) < 4:
-        sys.stdout.write("Usage: python3 network.py [networkSimulationFile.json] [flowtrace.dat] [endtimeslot]\n")
-        return
-    netCfgFilepath = sys.argv[1]
-    flowtrace = sys.argv[2]
-    logname = sys.argv[3]
-    endTimeslot = int(sys.argv[4])
-    net = Network(netCfgFilepath)
-    protected = set(glob.glob(os.path.join('logs', 'recvd-flows-*.txt')))
+    parser = argparse.ArgumentParser(description="Run the network simulation")
+    parser.add_argument("netCfgFilepath", help="network simulation file (.json)")
+    parser.add_argument("flowtrace", help="flow trace file")
+    parser.add_argument("logname", help="suffix of the recvd-flows log files")
+    parser.add_argument("endTimeslot", type=int, help="timeslot at which the simulation ends")
+    parser.add_argument("--event-driven", action="store_true",
+                        help="skip timeslots in which no host or switch has work to do")
+    parser.add_argument("--route-trace", choices=["off", "sampled", "full"], default="off",
+                        help="record the route of no packet, of the packets of a sample of flows, or of every packet")
+    parser.add_argument("--route-sample-rate", type=float, default=0.01,
+                        help="fraction of flows whose routes are recorded with --route-trace sampled")
+    parser.add_argument("--debug-packet-pool", action="store_true",
+                        help="never recycle packets and fail on any use of a packet after its release")
+    parser.add_argument("--log-level", choices=["none", "flows", "packets"], default="flows",
+                        help="log nothing, the finished flows (appended to logs/recvd-flows-<logname>.npy, .csv and .txt), or the "
+                             "finished flows and every received packet (to logs/recvd-packets.bin, rendered as text by packetlog.py)")
+    parser.add_argument("--flow-text", action=argparse.BooleanOptionalAction, default=True,
+                        help="also append the finished flows to logs/recvd-flows-<logname>.txt as text (default: on)")
+    parser.add_argument("--delayed-ack", type=int, default=1, metavar="M",
+                        help="acknowledge every M in-order packets with one cumulative ACK (default: every packet)")
+    parser.add_argument("--ooo-window", type=int, default=4096, metavar="N",
+                        help="remember out-of-order arrivals up to N seq nums past the next expected one; "
+                             "later ones are counted as reordered but not deduplicated (default: 4096)")
+    parser.add_argument("--ecmp-hash", choices=sorted(ECMP_HASHES), default="sha256",
+                        help="hash that spreads flows over the uplinks (default: sha256; crc32 is cheaper but spreads them differently)")
+    parser.add_argument("--trace-flow", action="append", default=[], metavar="SRC,DST[,SPORT,DPORT]",
+                        help="trace the packets of the matching flows to logs/trace.txt (repeatable)")
+    parser.add_argument("--trace-host", action="append", default=[], metavar="HOST",
+                        help="trace the packets of the flows from or to HOST (repeatable)")
+    parser.add_argument("--trace-switch", action="append", default=[], metavar="SWITCH",
+                        help="trace the packets arriving at SWITCH (repeatable)")
+    args = parser.parse_args()
+    if args.delayed_ack < 1:
+        parser.error("--delayed-ack must be at least 1")
+    if args.ooo_window < 1:
+        parser.error("--ooo-window must be at least 1")
+    netCfgFilepath = args.netCfgFilepath
+    flowtrace = args.flowtrace
+    logname = args.logname
+    endTimeslot = args.endTimeslot
+    net = Network(netCfgFilepath, args.debug_packet_pool, args.ecmp_hash)
+    protected = set(glob.glob(os.path.join('logs', 'recvd-flows-*')))
     files = glob.glob('logs/*')
     for f in files: 
         if f not in protected:
             os.remove(f)
-    flowLogFile = open(f"logs/recvd-flows-{logname}.txt", "a")
-    net.run(flowtrace, endTimeslot, flowLogFile)
-    flowLogFile.close()
+    packetLog = None
+    if args.log_level == "packets":
+        packetLog = PacketLog("logs/recvd-packets.bin", net.nodeNames, len(net.hosts))
+    routeTracer = None if args.route_trace == "off" else RouteTracer(args.route_trace, args.route_sample_rate)
+    tracer = None
+    if args.trace_flow or args.trace_host or args.trace_switch:
+        for addr in args.trace_host + args.trace_switch:
+            if addr not in net.hosts and addr not in net.switches:
+                parser.error("unknown node to trace: " + addr)
+        try:
+            tracer = Tracer(open("logs/trace.txt", "w"), args.trace_flow, args.trace_host, args.trace_switch)
+        except ValueError as e:
+            parser.error(str(e))
+    flows = net.run(flowtrace, endTimeslot, args.event_driven, routeTracer, packetLog, tracer, args.delayed_ack, args.ooo_window)
+    if packetLog is not None:
+        packetLog.close()
+    if tracer is not None:
+        tracer.out.close()
+    if flows is not None and args.log_level != "none":
+        saveFlows(f"logs/recvd-flows-{logname}", flows, net.nodeNames)
+        if args.flow_text:
+            with open(f"logs/recvd-flows-{logname}.txt", "a") as flowLogFile:
+                writeFlowsText(flowLogFile, flows, net.nodeNames)
     return
 
 
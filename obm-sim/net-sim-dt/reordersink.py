@@ -0,0 +1,31 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+from collections import defaultdict
+
+class ReorderSink:
+    """Append-only store of the reordering events seen at the hosts"""
+
+    def __init__(self, addrs, nodeNames):
+        """Create an empty event list per host, dumped in the order given.
+           nodeNames maps the node IDs in the flow keys to names"""
+        self.nodeNames = nodeNames
+        self.events = {}  # key: host addr
+                          # value: dict, key: 4-tuple (dst node ID, src node ID, dst port, src port)
+                          #              value: list of (next expected seq num, received seq num, priority)
+        for addr in addrs:
+            self.events[addr] = defaultdict(list)
+
+
+    def record(self, addr, key, nextExpected, seqNum, priority):
+        """Record an out-of-order arrival of seqNum at host addr"""
+        self.events[addr][key].append((nextExpected, seqNum, priority))
+
+
+    def dump(self, f):
+        """Write all events to f, grouped by host and then by flow"""
+        for h, eventsByFlow in self.events.items():
+            for (dst, src, dport, sport), events in eventsByFlow.items():
+                for ne, seq, pri in events:
+                    f.write(f"{h},{self.nodeNames[src]},{self.nodeNames[dst]},{sport},{dport},{ne},{seq},{pri}\n")
+        f.write("@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@\n")
@@ -0,0 +1,31 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import zlib
+
+class RouteTracer:
+    """Decides which packets record the route they take through the network.
+       Route tracing is off unless hosts are given a RouteTracer"""
+
+    def __init__(self, mode, sampleRate=0.01):
+        """mode is "full" (trace every packet) or "sampled" (trace the packets
+           of a hash-selected fraction sampleRate of the flows)"""
+        if mode not in ("full", "sampled"):
+            raise ValueError("Unknown route trace mode: " + str(mode))
+        self.mode = mode
+        self.threshold = int(sampleRate * 2**32)  # flows whose hash is below this are traced
+
+
+    def traced(self, srcAddr, dstAddr, srcPort, dstPort):
+        """Returns True if packets of the flow should record their route"""
+        if self.mode == "full":
+            return True
+        flow = srcAddr + "," + dstAddr + "," + str(srcPort) + "," + str(dstPort)
+        return zlib.crc32(flow.encode()) < self.threshold
+
+
+def formatRoute(route, nodeNames):
+    """Render a route, a list of (node ID, entry timeslot, exit timeslot) hops.
+       A missing timeslot (entry at the source, exit at the destination) is written as '-'"""
+    return '->'.join('(%s,%s,%s)' % (nodeNames[node], '-' if entry is None else entry, '-' if exit is None else exit)
+                     for node, entry, exit in route)
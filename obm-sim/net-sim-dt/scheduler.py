@@ -0,0 +1,65 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import heapq
+
+class ActiveSet:
+    """Set of hosts or switches that need to be ticked, kept in tick order.
+
+       Members are woken either for a future timeslot (e.g., when a packet
+       sent on a link becomes ready at the other end) or for the current one
+       (e.g., when an ACK is enqueued). A member woken for the current timeslot
+       is ticked in this timeslot if its turn has not passed yet, otherwise in
+       the next one, i.e., exactly when a loop over all members would have
+       ticked it"""
+
+    def __init__(self, addrs):
+        """Create an active set over addrs, ticked in the order given"""
+        self.addrs = list(addrs)
+        self.index = {addr: i for i, addr in enumerate(self.addrs)}
+        self.nextSet = set()   # indices to tick in the next timeslot
+        self.future = {}       # key: timeslot, value: set of indices to tick then
+        self.futureTimes = []  # heap of the keys of self.future
+        self.heap = []         # indices still to tick in the current timeslot
+        self.inHeap = set()    # the same indices, for membership tests
+        self.pos = None        # index being ticked, None when not ticking
+
+
+    def wake(self, addr, timeslot=None):
+        """Mark addr as active in timeslot, or as soon as possible if timeslot is None"""
+        i = self.index[addr]
+        if timeslot is not None:
+            if timeslot not in self.future:
+                self.future[timeslot] = set()
+                heapq.heappush(self.futureTimes, timeslot)
+            self.future[timeslot].add(i)
+        elif self.pos is not None and i > self.pos:
+            if i not in self.inHeap:
+                self.inHeap.add(i)
+                heapq.heappush(self.heap, i)
+        else:
+            self.nextSet.add(i)
+
+
+    def tick(self, currTimeslot):
+        """Yield the active members for currTimeslot in tick order"""
+        due = self.nextSet
+        self.nextSet = set()
+        while self.futureTimes and self.futureTimes[0] <= currTimeslot:
+            due |= self.future.pop(heapq.heappop(self.futureTimes))
+        self.heap = sorted(due)
+        self.inHeap = due
+        while self.heap:
+            self.pos = heapq.heappop(self.heap)
+            yield self.addrs[self.pos]
+        self.pos = None
+
+
+    def nextTimeslot(self, currTimeslot):
+        """Returns the earliest timeslot >= currTimeslot in which some member is
+           active, or None if no member will ever be active again"""
+        if self.nextSet:
+            return currTimeslot
+        if self.futureTimes:
+            return max(self.futureTimes[0], currTimeslot)
+        return None
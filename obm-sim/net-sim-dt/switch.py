@@ -3,7 +3,6 @@
 
 import sys
 import queue
-import hashlib
 from link import Link
 import math
 import copy
@@ -15,8 +14,16 @@ class Switch():
     def __init__(self, addr, num_tor_ports, num_agg_ports, hosts_per_rack):
         """Initialize parameters"""
         self.addr = addr  # address of switch
+        self.id = None  # node ID, assigned by the network
+        self.nodeNames = None  # node names indexed by node ID, for routing and logs
+        self.packetPool = None  # dropped and pushed-out packets are released to this pool
+        self.tracer = None  # Tracer, None unless this switch is traced
+        self.routes = None  # by destination host ID, the tuple of ports that ECMP spreads the flows over
+        self.ecmpShift = 0  # the ports are picked by the ECMP hash shifted right by this many bits
         self.links = {}   # links indexed by port, i.e., {port:link, ......, port:link}
-        self.queues = {}  # list of virtual output queues (of type queue.Queue) per port
+        self.inbox = []   # packets delivered from the links in this timeslot, as (port, packet);
+                          # at most one per port, as each link carries at most one packet per timeslot
+        self.queues = {}  # list of virtual output queues (of type VOQ) per port
                           # indexed by port, i.e., {port:[queue], ......, port:[queue]}
                           # each virtual output queue is a FIFO queue of infinite size
         self.voq_rr = {}  # stores the VOQ per port to be serviced next
@@ -39,7 +46,7 @@ class Switch():
             self.N = self.ports
             self.voq_port_qsize = [[0 for i in range(self.priority_classes)] for _ in range(self.N)]
             print(num_tor_ports)
-        elif self.addr[0] == 'a':
+        elif self.addr[0] == 'a' or self.addr[0] == 'c':  # core switches are set up like aggregation switches
             self.ports = num_agg_ports
             self.total_buffer_size = self.per_port_max_qsize*num_agg_ports
             self.N = self.ports
@@ -64,40 +71,30 @@ class Switch():
                                         # at the head of a VOQ at each port.
                                         # VOQs at each port are scheduled in
                                         # round robin manner
-            flag_1 = 0
             for i in range(self.priority_classes):
-                if not self.queues[port][i].empty():
-                    for j in range(0,self.queues[port][i].qsize()):
-                        packet = self.queues[port][i].get_nowait()
-                        if packet.invalid == 0:
-                            self.links[port].send(packet, self.addr, currTimeslot)
-                            # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
-                            # if i == 0:
-                            #     breakpoint()
-                            
-                            self.port_qsize[port] -= 1
-                            self.sent+=1
-                            self.total_usage-=1 
-                            self.voq_port_qsize[port-1][i]-=1
-                            flag_1 = 1
-                            assert(self.port_qsize[port] >= 0)
-                            break
-
-                    if flag_1:
-                        break
-
-                else:
-                    continue
-
-
-        for port in self.links.keys():  # in each timeslot, receive a
-                                        # pa cket (if any) on each input
-                                        # port and handle it
-            packet = self.links[port].recv(self.addr, currTimeslot)
-            if packet:
-                self.handleRecvdPacket(packet, currTimeslot)
-            else:
-                self.final_add[port-1] = 0
+                if self.queues[port][i].size:
+                    packet = self.queues[port][i].pop()
+                    self.links[port].send(packet, self.addr, currTimeslot)
+                    # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
+                    # if i == 0:
+                    #     breakpoint()
+                    
+                    self.port_qsize[port] -= 1
+                    self.sent+=1
+                    self.total_usage-=1 
+                    self.voq_port_qsize[port-1][i]-=1
+                    assert(self.port_qsize[port] >= 0)
+                    break
+
+
+        self.inbox.sort(key=lambda arrival: arrival[0])
+        if self.tracer is not None:
+            for port, packet in self.inbox:
+                self.tracer.switchRecvd(currTimeslot, self, port, packet)
+        for port, packet in self.inbox:  # in each timeslot, handle the packets
+                                         # received on the input ports, in port order
+            self.handleRecvdPacket(packet, currTimeslot)
+        self.inbox = []
         
         #if self.t > self.track:
         #    self.track +=200
@@ -109,25 +106,30 @@ class Switch():
         #            print(f"threshold = {self.T}")
         return self.packet_dropped
         
+    def isIdle(self):
+        """Returns True if nothing is queued at the switch, i.e., runSwitch has
+           nothing to do until a packet arrives on one of its links"""
+        if self.total_usage > 0:
+            return False
+        for port in self.queues:
+            for i in range(self.priority_classes):
+                if self.queues[port][i].size:
+                    return False
+        return True
+
+
     def setECNFlag(self, packet, outPort):
         if self.port_qsize[outPort] > self.K:
             packet.ecnFlag = 1
 
 
-    def ecmp(self, packet):
-        flowid = packet.srcAddr + packet.dstAddr + str(packet.srcPort) + str(packet.dstPort)
-        outPort = int(hashlib.sha256(flowid.encode('utf-8')).hexdigest(), 16) % (self.num_tor_ports - self.hosts_per_rack) + (self.hosts_per_rack + 1)
-        return outPort
-
-
-    def getOutPort(self, switchId, packet):
-        if switchId[0] == 't':
-            if int(packet.dstAddr[1:]) >= int(switchId[1])*16-15 and int(packet.dstAddr[1:]) <= int(switchId[1])*16:
-                return int(packet.dstAddr[1:])-((int(switchId[1])-1)*16)
-            else:
-                return self.ecmp(packet)
-        elif switchId[0] == 'a':
-            return int((int(packet.dstAddr[1:])-1)/16)+1
+    def getOutPort(self, packet):
+        """Returns the output port of packet: the port towards its destination in
+           the routing table, picked by the packet's ECMP hash if there are several"""
+        ports = self.routes[packet.dstAddr]
+        if len(ports) == 1:
+            return ports[0]
+        return ports[(packet.ecmpHash >> self.ecmpShift) % len(ports)]
 ######################################################################## Additional ######################################################################################
 
     def threshold_calculate(self):
@@ -146,17 +148,17 @@ class Switch():
     def handleRecvdPacket(self, packet, arrivalTime):
         """Handle the packet received on the specified input port 'inPort'.
            arrivalTime is the timeslot in which the packet was received"""
-        outPort = self.getOutPort(self.addr, packet)  # output port the packet needs to be sent out on
+        outPort = self.getOutPort(packet)  # output port the packet needs to be sent out on
         
 ################################################################################ BIT MAPPER ########################################################################################
         if self.total_buffer_size > self.total_usage:
             
                ######## WHY??
-            #self.queues[outPort][inPort-1].put(packet)  # add packet to the right VOQ at the output port
+            #self.queues[outPort][inPort-1].push(packet)  # add packet to the right VOQ at the output port
             inPort = packet.priority
             if self.voq_port_qsize[outPort-1][inPort-1] < self.T[inPort-1]:
                 self.total_usage +=1
-                self.queues[outPort][inPort-1].put(packet)
+                self.queues[outPort][inPort-1].push(packet)
                 self.port_qsize[outPort] += 1
                 self.voq_port_qsize[outPort-1][inPort-1]+=1
                 self.setECNFlag(packet, outPort)
@@ -167,13 +169,13 @@ class Switch():
                 #print("Packet drop due to DT")
                 self.packet_dropped += 1
                 #print(f"packet dropped = {self.packet_dropped}")
-                pass
+                self.packetPool.release(packet)
             
         else:
         
             print("Packet drop due to space constraint")
             self.packet_dropped += 1
-            pass
+            self.packetPool.release(packet)
         
         self.threshold_calculate()
         
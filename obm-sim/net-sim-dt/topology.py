@@ -0,0 +1,89 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import argparse
+import json
+
+def twoTier(numRacks, hostsPerRack, numAggs):
+    """Returns the network simulation parameters of a 2-tier topology: numRacks
+       ToRs with hostsPerRack hosts each, every ToR linked to each of numAggs
+       aggregation switches. The layout of 144-host-2-tier-fattree.json"""
+    hosts = ["h" + str(i) for i in range(1, numRacks * hostsPerRack + 1)]
+    tors = ["t" + str(i) for i in range(1, numRacks + 1)]
+    aggs = ["a" + str(i) for i in range(1, numAggs + 1)]
+    links = []
+    for i, host in enumerate(hosts):
+        links.append([host, tors[i // hostsPerRack], 1, i % hostsPerRack + 1])
+    for r, tor in enumerate(tors):
+        for a, agg in enumerate(aggs):
+            links.append([tor, agg, hostsPerRack + a + 1, r + 1])
+    return {"hosts": hosts, "switches": tors + aggs, "num_tor_ports": hostsPerRack + numAggs,
+            "num_agg_ports": numRacks, "hosts_per_rack": hostsPerRack, "links": links}
+
+
+def fatTree(k):
+    """Returns the network simulation parameters of a 3-tier k-ary fat-tree:
+       k pods of k/2 ToRs and k/2 aggregation switches, (k/2)^2 core switches
+       and k^3/4 hosts, all switches with k ports. In a pod, every ToR is linked
+       to every aggregation switch; aggregation switch j of every pod is linked
+       to the core switches j*k/2+1 to (j+1)*k/2, on core port pod+1"""
+    if k < 2 or k % 2:
+        raise ValueError("k should be even and at least 2: " + str(k))
+    half = k // 2
+    hosts = ["h" + str(i) for i in range(1, k * half * half + 1)]
+    tors = ["t" + str(i) for i in range(1, k * half + 1)]
+    aggs = ["a" + str(i) for i in range(1, k * half + 1)]
+    cores = ["c" + str(i) for i in range(1, half * half + 1)]
+    links = []
+    for i, host in enumerate(hosts):
+        links.append([host, tors[i // half], 1, i % half + 1])
+    for pod in range(k):
+        for t in range(half):
+            for a in range(half):
+                links.append([tors[pod * half + t], aggs[pod * half + a], half + a + 1, t + 1])
+        for a in range(half):
+            for c in range(half):
+                links.append([aggs[pod * half + a], cores[a * half + c], half + c + 1, pod + 1])
+    return {"hosts": hosts, "switches": tors + aggs + cores, "num_tor_ports": k, "num_agg_ports": k,
+            "num_core_ports": k, "hosts_per_rack": half, "links": links}
+
+
+def writeTopology(path, topology):
+    """Write topology to the network simulation file at path, one link per line"""
+    lines = []
+    for key, value in topology.items():
+        if key == "links":
+            lines.append('  "links": [\n' + ",\n".join("    " + json.dumps(link) for link in value) + "\n  ]")
+        else:
+            lines.append("  " + json.dumps(key) + ": " + json.dumps(value))
+    with open(path, "w") as f:
+        f.write("{\n" + ",\n".join(lines) + "\n}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a network simulation file (.json)")
+    subparsers = parser.add_subparsers(dest="kind", required=True)
+    p = subparsers.add_parser("2tier", help="ToRs linked to every aggregation switch")
+    p.add_argument("racks", type=int, help="number of ToRs")
+    p.add_argument("hostsPerRack", type=int, help="number of hosts per ToR")
+    p.add_argument("aggs", type=int, help="number of aggregation switches")
+    p.add_argument("output", help="network simulation file to write")
+    p = subparsers.add_parser("fattree", help="3-tier k-ary fat-tree (k^3/4 hosts)")
+    p.add_argument("k", type=int, help="number of ports per switch, even")
+    p.add_argument("output", help="network simulation file to write")
+    args = parser.parse_args()
+
+    if args.kind == "2tier":
+        topology = twoTier(args.racks, args.hostsPerRack, args.aggs)
+    else:
+        try:
+            topology = fatTree(args.k)
+        except ValueError as e:
+            parser.error(str(e))
+    writeTopology(args.output, topology)
+    print(str(len(topology["hosts"])) + " hosts, " + str(len(topology["switches"])) + " switches, "
+          + str(len(topology["links"])) + " links")
+
+
+if __name__ == "__main__":
+    main()
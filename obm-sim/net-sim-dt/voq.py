@@ -0,0 +1,72 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+class VOQ:
+    """Virtual output queue: a FIFO of packets of unbounded size.
+
+       The packets are linked through their own voqPrev and voqNext fields,
+       so a packet is removed in O(1) from the head, from the tail (push-out)
+       or from anywhere in the queue, and a removed packet is gone for good:
+       the queue never holds dead packets"""
+
+    __slots__ = ("head", "tail", "size")
+
+    def __init__(self):
+        self.head = None  # oldest packet, the next one to be sent
+        self.tail = None  # newest packet, the first one to be pushed out
+        self.size = 0     # number of packets queued
+
+
+    def push(self, packet):
+        """Append packet at the tail"""
+        packet.voqPrev = self.tail
+        packet.voqNext = None
+        if self.tail is None:
+            self.head = packet
+        else:
+            self.tail.voqNext = packet
+        self.tail = packet
+        self.size += 1
+
+
+    def pop(self):
+        """Remove and return the packet at the head. The queue must not be empty"""
+        packet = self.head
+        self.head = packet.voqNext
+        if self.head is None:
+            self.tail = None
+        else:
+            self.head.voqPrev = None
+        packet.voqNext = None
+        self.size -= 1
+        return packet
+
+
+    def popTail(self):
+        """Remove and return the packet at the tail. The queue must not be empty"""
+        packet = self.tail
+        self.remove(packet)
+        return packet
+
+
+    def remove(self, packet):
+        """Remove packet, which must be in this queue"""
+        if packet.voqPrev is None:
+            self.head = packet.voqNext
+        else:
+            packet.voqPrev.voqNext = packet.voqNext
+        if packet.voqNext is None:
+            self.tail = packet.voqPrev
+        else:
+            packet.voqNext.voqPrev = packet.voqPrev
+        packet.voqPrev = None
+        packet.voqNext = None
+        self.size -= 1
+
+
+    def __iter__(self):
+        """Iterate over the packets from head to tail"""
+        packet = self.head
+        while packet is not None:
+            yield packet
+            packet = packet.voqNext
@@ -0,0 +1,30 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+class TimingWheel:
+    """Packets in flight on all links, bucketed by the timeslot they arrive in.
+
+       All links have the same delay, so a packet sent in timeslot t arrives in
+       t + delay and delay + 1 buckets, reused modulo, are enough"""
+
+    def __init__(self, delay):
+        """Create an empty bucket per timeslot in [t, t + delay]"""
+        self.buckets = [[] for _ in range(delay + 1)]
+
+
+    def schedule(self, timeslot, node, port, packet):
+        """Deliver packet to port of node (a host or switch) in timeslot"""
+        self.buckets[timeslot % len(self.buckets)].append((port, node, packet))
+
+
+    def deliver(self, currTimeslot):
+        """Push the packets arriving in currTimeslot into their nodes' inboxes"""
+        i = currTimeslot % len(self.buckets)
+        bucket = self.buckets[i]
+        if bucket:
+            self.buckets[i] = []
+            for port, node, packet in bucket:
+                if packet.route is not None:
+                    packet.node = node.id
+                    packet.entryTimeslot = currTimeslot
+                node.inbox.append((port, packet))
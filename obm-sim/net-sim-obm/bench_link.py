@@ -0,0 +1,103 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import sys
+import time
+import queue
+from link import Link
+from packet import Packet
+from wheel import TimingWheel
+
+class QueueLink(Link):
+    """The previous Link implementation on queue.Queue, kept for comparison"""
+
+    def __init__(self, e1, e2):
+        super().__init__(e1, e2)
+        self.q12 = queue.Queue()
+        self.q21 = queue.Queue()
+
+
+    def send(self, packet, endpoint, currTimeslot):
+        packet.timeslotToDeq = currTimeslot + self.delay
+        if packet.sendTimeslot is None:
+            packet.sendTimeslot = currTimeslot
+        if endpoint == self.e1:
+            self.q12.put(packet)
+        elif endpoint == self.e2:
+            self.q21.put(packet)
+
+
+    def recv(self, endpoint, currTimeslot):
+        q = self.q21 if endpoint == self.e1 else self.q12
+        if not q.empty():
+            if currTimeslot >= q.queue[0].timeslotToDeq:
+                return q.get()
+        return None
+
+
+class Endpoint:
+    """Host or switch stand-in that only collects delivered packets"""
+
+    def __init__(self, addr, id):
+        self.addr = addr
+        self.id = id
+        self.inbox = []
+
+
+def benchQueueLink(numPkts):
+    """Send numPkts packets each way through a QueueLink, one per timeslot,
+       and return the number of packets per second through the link"""
+    packets = [Packet(0, 1, 1, 1, i, 0, 0, 0) for i in range(numPkts)]
+    acks = [Packet(1, 0, 1, 1, 0, i, 1, 0) for i in range(numPkts)]
+    link = QueueLink("h0", "h1")
+    recvd = 0
+    start = time.perf_counter()
+    for t in range(numPkts + link.delay):
+        if t < numPkts:
+            link.send(packets[t], "h0", t)
+            link.send(acks[t], "h1", t)
+        if link.recv("h1", t):
+            recvd += 1
+        if link.recv("h0", t):
+            recvd += 1
+    elapsed = time.perf_counter() - start
+    assert recvd == 2 * numPkts
+    return recvd / elapsed
+
+
+def benchLink(numPkts):
+    """Same as benchQueueLink, through a Link and the timing wheel"""
+    packets = [Packet(0, 1, 1, 1, i, 0, 0, 0) for i in range(numPkts)]
+    acks = [Packet(1, 0, 1, 1, 0, i, 1, 0) for i in range(numPkts)]
+    link = Link("h0", "h1")
+    link.node1 = Endpoint("h0", 0)
+    link.node2 = Endpoint("h1", 1)
+    link.wheel = TimingWheel(link.delay)
+    recvd = 0
+    start = time.perf_counter()
+    for t in range(numPkts + link.delay):
+        link.wheel.deliver(t)
+        if t < numPkts:
+            link.send(packets[t], "h0", t)
+            link.send(acks[t], "h1", t)
+        for node in (link.node2, link.node1):
+            if node.inbox:
+                node.inbox.pop()
+                recvd += 1
+    elapsed = time.perf_counter() - start
+    assert recvd == 2 * numPkts
+    return recvd / elapsed
+
+
+def main():
+    """Usage: python bench_link.py [number of packets]"""
+    numPkts = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    before = benchQueueLink(numPkts)
+    after = benchLink(numPkts)
+    sys.stdout.write("queue.Queue link: " + str(round(before)) + " packets/sec\n")
+    sys.stdout.write("timing wheel link: " + str(round(after)) + " packets/sec\n")
+    sys.stdout.write("speedup: " + str(round(after / before, 2)) + "x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+class SendFlow:
+    """State of a flow at its source host"""
+
+    __slots__ = ("flowId", "dst", "sport", "dport", "size", "nextSeq", "lastAck", "timer", "priority", "ecmpHash", "cwnd", "alpha",
+                 "numPktSentInCurrWin", "numAckRecvdInCurrWin", "numECNAckRecvdInCurrWin", "listed", "finished", "tracer")
+
+    def __init__(self, flowId, dst, sport, dport, size, priority, ecmpHash, tracer=None):
+        """Initialize the state of a new flow of size packets, whose data packets have ECMP hash ecmpHash"""
+        self.flowId = flowId      # flow ID, carried in the flow's packets
+        self.dst = dst            # node ID of the destination host
+        self.sport = sport        # source port value
+        self.dport = dport        # destination port value
+        self.size = size          # flow size (in number of packets)
+        self.nextSeq = 0          # next seq num to send
+        self.lastAck = 0          # last ack num recvd
+        self.timer = 0            # timeslot of the last send; the retransmission timer expires RTO later
+        self.priority = priority  # priority class, 1 (highest) to 3
+        self.ecmpHash = ecmpHash  # ECMP hash of the data packets
+        self.cwnd = 50            # congestion window
+        self.alpha = 0            # DCTCP alpha
+        self.numPktSentInCurrWin = 0      # number of packets sent in current window
+        self.numAckRecvdInCurrWin = 0     # number of acks received in current window
+        self.numECNAckRecvdInCurrWin = 0  # number of acks received in current window with ECN flag set
+        self.listed = False       # True while the flow is in the ready list of its host
+        self.finished = False     # True once acks for all packets have been received
+        self.tracer = tracer      # Tracer of the flow, None if it is not traced
+
+
+    def canSend(self):
+        """Returns True if the flow is not finished and has data left to send and room in its congestion window.
+           A flow rewound by a timeout may be acked up to its size, and so finish, before it resent everything"""
+        return not self.finished and self.numPktSentInCurrWin < self.cwnd and self.nextSeq < self.size
+
+
+class RecvFlow:
+    """State of a flow at its destination host"""
+
+    __slots__ = ("flowId", "Id", "src", "sport", "dport", "size", "nextExpected", "startTime", "timeLastPktSent", "dupAckSent",
+                 "unacked", "ackEcnFlag", "ackDeadline", "oooNext", "oooBits", "numReordered", "tracer")
+
+    def __init__(self, flowId, Id, src, sport, dport, size, startTime, tracer=None):
+        """Initialize the state of a new flow of size packets from the host with
+           node ID src, starting in timeslot startTime"""
+        self.flowId = flowId        # flow ID, carried in the flow's packets
+        self.Id = Id                # flow Id in the flowtrace
+        self.src = src              # node ID of the source host
+        self.sport = sport          # source port value
+        self.dport = dport          # destination port value
+        self.size = size            # flow size (in number of packets)
+        self.nextExpected = 0       # next expected seq num
+        self.startTime = startTime  # flow start time
+        self.timeLastPktSent = 0    # time the last packet was sent
+        self.dupAckSent = 0         # set to 0 or 1 (1 = dup ack sent)
+        self.unacked = 0            # number of in-order packets received but not acked yet (delayed ACKs)
+        self.ackEcnFlag = 0         # ECN flag of these packets, all the same
+        self.ackDeadline = None     # timeslot by which they are acked
+        self.oooNext = 0            # next seq num not yet seen, in any order; runs ahead of nextExpected
+                                    # when the seq nums after it already arrived out of order
+        self.oooBits = 0            # bitmap of the seq nums oooNext + i (i > 0) that arrived out of order
+        self.numReordered = 0       # number of out-of-order arrivals
+        self.tracer = tracer        # Tracer of the flow, None if it is not traced
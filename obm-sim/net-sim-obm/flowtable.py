@@ -0,0 +1,50 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+import sys
+
+class FlowTable:
+    """State of the flows in progress, indexed by flow ID: the SendFlow at the
+       source host and the RecvFlow at the destination host.
+
+       A record is dropped as soon as its side of the flow finishes, so the state
+       held grows with the flows in progress rather than with all flows seen.
+       The metrics of finished flows are kept in flowRecords instead"""
+
+    def __init__(self, numFlows, numNodes, flowRecords):
+        """Create an empty table for numFlows flows between numNodes nodes"""
+        self.sendFlows = [None] * numFlows  # SendFlow by flow ID, None before the flow starts and once it finished
+        self.recvFlows = [None] * numFlows  # RecvFlow by flow ID, None before the flow starts and once it finished
+        self.flowRecords = flowRecords      # FlowRecords of the finished flows
+        self.numTracked = [0] * numNodes    # by node ID: number of SendFlow and RecvFlow records held
+        self.bytesTracked = [0] * numNodes  # by node ID: size of these records (in bytes)
+
+
+    def addSend(self, hostId, flow):
+        """Track flow, a SendFlow of host hostId"""
+        self.sendFlows[flow.flowId] = flow
+        self.numTracked[hostId] += 1
+        self.bytesTracked[hostId] += sys.getsizeof(flow)
+
+
+    def addRecv(self, hostId, flowId, flow):
+        """Track flow, the RecvFlow of flow flowId at host hostId"""
+        self.recvFlows[flowId] = flow
+        self.numTracked[hostId] += 1
+        self.bytesTracked[hostId] += sys.getsizeof(flow)
+
+
+    def removeSend(self, hostId, flowId):
+        """Drop the SendFlow of flow flowId at host hostId"""
+        flow = self.sendFlows[flowId]
+        self.sendFlows[flowId] = None
+        self.numTracked[hostId] -= 1
+        self.bytesTracked[hostId] -= sys.getsizeof(flow)
+
+
+    def removeRecv(self, hostId, flowId):
+        """Drop the RecvFlow of flow flowId at host hostId"""
+        flow = self.recvFlows[flowId]
+        self.recvFlows[flowId] = None
+        self.numTracked[hostId] -= 1
+        self.bytesTracked[hostId] -= sys.getsizeof(flow)
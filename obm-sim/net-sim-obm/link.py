@@ -2,57 +2,41 @@
 # Do not share, distribute, or post online.
 
 import sys
-import queue
 
 class Link:
     """Link class"""
 
     def __init__(self, e1, e2):
-        """Create link queues and link delay"""
+        """Create link endpoints and link delay"""
         self.e1 = e1  # addr of endpoint 1
         self.e2 = e2  # addr of endpoint 2
-        self.q12 = queue.Queue()  # link queue of infinite size
-        self.q21 = queue.Queue()  # link queue of infinite size
+        self.node1 = None  # host or switch at endpoint 1
+        self.node2 = None  # host or switch at endpoint 2
+        self.port1 = None  # port of endpoint 1 (if a switch) this link is attached to
+        self.port2 = None  # port of endpoint 2 (if a switch) this link is attached to
+        self.wheel = None  # timing wheel that delivers the packets in flight
         self.delay = 5 # in unit of timeslots (prop + switch delay = ~500 ns for 100Gbps 1500B packets)
+        self.active1 = None  # active set of endpoint 1, woken when a packet for it becomes ready
+        self.active2 = None  # active set of endpoint 2, woken when a packet for it becomes ready
 
 
     def send(self, packet, endpoint, currTimeslot):
-        """Sends packet from the endpoint out on this link"""
+        """Sends packet from the endpoint out on this link.
+           The packet is pushed into the inbox of the other endpoint
+           delay timeslots later"""
         packet.timeslotToDeq = currTimeslot + self.delay
-        if packet.node is None:
-            packet.node = endpoint
-            packet.entryTimeslot = str('-')
-        packet.exitTimeslot = str(currTimeslot)
-        packet.route.append((packet.node, packet.entryTimeslot, packet.exitTimeslot))
+        if packet.sendTimeslot is None:
+            packet.sendTimeslot = currTimeslot
+        if packet.route is not None:
+            if packet.node is None:
+                packet.node = self.node1.id if endpoint == self.e1 else self.node2.id
+            packet.route.append((packet.node, packet.entryTimeslot, currTimeslot))
         if endpoint == self.e1:
-            self.q12.put(packet)
+            self.wheel.schedule(packet.timeslotToDeq, self.node2, self.port2, packet)
+            if self.active2 is not None:
+                self.active2.wake(self.e2, packet.timeslotToDeq)
         elif endpoint == self.e2:
-            self.q21.put(packet)
-
-
-    def recv(self, endpoint, currTimeslot):
-        """Checks whether a packet is ready to be received by endpoint on this link.
-           If packet is ready, returns the packet, else returns None"""
-        if endpoint == self.e1:
-            if not self.q21.empty():
-                if currTimeslot >= self.q21.queue[0].timeslotToDeq:
-                    packet = self.q21.get()
-                    packet.node = endpoint
-                    packet.entryTimeslot = str(currTimeslot)
-                    return packet
-                else:
-                    return None
-            else:
-                return None
-        elif endpoint == self.e2:
-            if not self.q12.empty():
-                if currTimeslot >= self.q12.queue[0].timeslotToDeq:
-                    packet = self.q12.get()
-                    packet.node = endpoint
-                    packet.entryTimeslot = str(currTimeslot)
-                    return packet
-                else:
-                    return None
-            else:
-                return None
+            self.wheel.schedule(packet.timeslotToDeq, self.node1, self.port1, packet)
+            if self.active1 is not None:
+                self.active1.wake(self.e1, packet.timeslotToDeq)
 
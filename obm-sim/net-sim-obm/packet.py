@@ -4,10 +4,13 @@
 class Packet:
     """Packet class"""
 
+    __slots__ = ("srcAddr", "dstAddr", "srcPort", "dstPort", "seqNum", "ackNum", "ackFlag", "ecnFlag", "priority", "flowId", "ecmpHash",
+                 "timeslotToDeq", "node", "entryTimeslot", "sendTimeslot", "route", "voqPrev", "voqNext", "ArrivalTimeOnSwitch")
+
     def __init__(self, srcAddr, dstAddr, srcPort, dstPort, seqNum, ackNum, ackFlag, ecnFlag):
         """Initialize packet header fields"""
-        self.srcAddr = srcAddr  # address of the source host
-        self.dstAddr = dstAddr  # address of the destination host
+        self.srcAddr = srcAddr  # node ID of the source host
+        self.dstAddr = dstAddr  # node ID of the destination host
         self.srcPort = srcPort  # source port value
         self.dstPort = dstPort  # destination port value
         self.seqNum = seqNum    # packet sequence number
@@ -15,12 +18,16 @@ class Packet:
         self.ackFlag = ackFlag  # set to 0 or 1 (1 = ACK packet)
         self.ecnFlag = ecnFlag  # set to 0 or 1
         self.priority = 0
+        self.flowId = None      # flow ID, index of the flow's state at the source and destination hosts
+        self.ecmpHash = None    # ECMP hash of the flow of a data packet, picks the uplink at the ToRs; ACKs go straight to their host
 
         """Simulator fileds. DO NOT TOUCH"""
         self.timeslotToDeq = None
         self.node = None
         self.entryTimeslot = None
-        self.exitTimeslot = None
-        self.route = []
-        self.invalid = 0
+        self.sendTimeslot = None  # timeslot in which the source host sent the packet
+        self.route = None  # list of (node, entry timeslot, exit timeslot) hops, only if the route is traced
+        self.voqPrev = None  # neighbors of the packet in the VOQ it is queued in
+        self.voqNext = None
+        self.ArrivalTimeOnSwitch = None
         
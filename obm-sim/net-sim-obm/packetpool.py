@@ -0,0 +1,54 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+from packet import Packet
+
+class ReleasedPacket(Packet):
+    """A packet returned to a debug PacketPool. Any access to it is a use after release"""
+
+    __slots__ = ()
+
+    def __getattribute__(self, name):
+        raise RuntimeError("Use of a released packet (attribute " + name + ")")
+
+
+    def __setattr__(self, name, value):
+        raise RuntimeError("Use of a released packet (attribute " + name + ")")
+
+
+class PacketPool:
+    """Freelist of data and ACK packets, so that packets are recycled
+       instead of allocated for every send.
+
+       A packet is released back to the pool once nothing refers to it anymore:
+       when an ACK has been consumed by its sender, a data packet has been
+       delivered to its receiver, or a switch drops or pushes out the packet"""
+
+    def __init__(self, debug=False):
+        """If debug is set, released packets are never reused and any later
+           access to one (including a second release) raises a RuntimeError"""
+        self.debug = debug
+        self.free = []
+        self.allocated = 0  # number of packets created by the pool
+        self.released = 0   # number of releases
+
+
+    def get(self, srcAddr, dstAddr, srcPort, dstPort, seqNum, ackNum, ackFlag, ecnFlag):
+        """Returns a packet with the given header fields and all simulator fields reset"""
+        if self.free:
+            packet = self.free.pop()
+            Packet.__init__(packet, srcAddr, dstAddr, srcPort, dstPort, seqNum, ackNum, ackFlag, ecnFlag)
+            return packet
+        self.allocated += 1
+        return Packet(srcAddr, dstAddr, srcPort, dstPort, seqNum, ackNum, ackFlag, ecnFlag)
+
+
+    def release(self, packet):
+        """Return packet to the pool. The caller must hold the last reference to it"""
+        self.released += 1
+        if self.debug:
+            if type(packet) is ReleasedPacket:
+                raise RuntimeError("Packet released twice")
+            packet.__class__ = ReleasedPacket
+        else:
+            self.free.append(packet)
@@ -0,0 +1,43 @@
+# The code is subject to Purdue University copyright policies.
+# Do not share, distribute, or post online.
+
+class QueueLengths(dict):
+    """Number of packets queued per port, a dict {port: length} that keeps
+       track of its longest port as the lengths change.
+
+       The ports are bucketed by length: masks[n] has bit r set for the port
+       added r-th if its length is n. Setting a length moves one bit between
+       two buckets, and the longest port is the lowest bit of the top bucket,
+       so both are O(1) whatever the number of ports"""
+
+    def __init__(self):
+        super().__init__()
+        self.bits = {}      # bit of every port, 1 << its rank in the order the ports were added
+        self.ports = []     # ports by rank
+        self.masks = [0]    # bitmask of the ranks of the ports, by length
+        self.maxLength = 0  # length of the longest port
+
+    def __setitem__(self, port, length):
+        masks = self.masks
+        bit = self.bits.get(port)
+        if bit is None:
+            self.bits[port] = bit = 1 << len(self.ports)
+            self.ports.append(port)
+        else:
+            masks[self.get(port)] ^= bit
+        dict.__setitem__(self, port, length)
+        if length >= len(masks):
+            masks.extend([0] * (length + 1 - len(masks)))
+        masks[length] |= bit
+        if length > self.maxLength:
+            self.maxLength = length
+        elif not masks[self.maxLength]:
+            while self.maxLength > 0 and not masks[self.maxLength]:
+                self.maxLength -= 1
+
+
+    def longest(self):
+        """Returns the port with the most packets queued, the first one added
+           among ties, i.e., max(self, key=self.get)"""
+        mask = self.masks[self.maxLength]
+        return self.ports[(mask & -mask).bit_length() - 1]
@@ -3,8 +3,8 @@
 
 import sys
 import queue
-import hashlib
 from link import Link
+from queuelengths import QueueLengths
 import math
 import copy
 
@@ -14,8 +14,16 @@ class Switch():
     def __init__(self, addr, num_tor_ports, num_agg_ports, hosts_per_rack):
         """Initialize parameters"""
         self.addr = addr  # address of switch
+        self.id = None  # node ID, assigned by the network
+        self.nodeNames = None  # node names indexed by node ID, for routing and logs
+        self.packetPool = None  # dropped and pushed-out packets are released to this pool
+        self.tracer = None  # Tracer, None unless this switch is traced
+        self.routes = None  # by destination host ID, the tuple of ports that ECMP spreads the flows over
+        self.ecmpShift = 0  # the ports are picked by the ECMP hash shifted right by this many bits
         self.links = {}   # links indexed by port, i.e., {port:link, ......, port:link}
-        self.queues = {}  # list of virtual output queues (of type queue.Queue) per port
+        self.inbox = []   # packets delivered from the links in this timeslot, as (port, packet);
+                          # at most one per port, as each link carries at most one packet per timeslot
+        self.queues = {}  # list of virtual output queues (of type VOQ) per port
                           # indexed by port, i.e., {port:[queue], ......, port:[queue]}
                           # each virtual output queue is a FIFO queue of infinite size
         self.voq_rr = {}  # stores the VOQ per port to be serviced next
@@ -28,7 +36,7 @@ class Switch():
         self.tor_buff_size = self.per_port_max_qsize * self.num_tor_ports # in terms of number of packets
         self.agg_buff_size = self.per_port_max_qsize * self.num_agg_ports # in terms of number of packets
         self.packet_dropped = 0
-        self.port_qsize = {}  # number of packets queued per port
+        self.port_qsize = QueueLengths()  # number of packets queued per port, knows its longest port
         self.priority_classes = 3
         if self.addr[0] == 't':
             self.ports = num_tor_ports
@@ -36,7 +44,7 @@ class Switch():
             self.N = 1 if num_tor_ports < 1 else 2 ** ((num_tor_ports - 1).bit_length())
             self.voq_port_qsize = [[0 for i in range(self.priority_classes)] for _ in range(self.N)]
             print(num_tor_ports)
-        elif self.addr[0] == 'a':
+        elif self.addr[0] == 'a' or self.addr[0] == 'c':  # core switches are set up like aggregation switches
             self.ports = num_agg_ports
             self.total_buffer_size = self.per_port_max_qsize*num_agg_ports
             self.N = 1 if num_agg_ports < 1 else 2 ** ((num_agg_ports - 1).bit_length())
@@ -67,33 +75,21 @@ class Switch():
                                         # at the head of a VOQ at each port.
                                         # VOQs at each port are scheduled in
                                         # round robin manner
-            flag_1 = 0
             for i in range(self.priority_classes):
-                if not self.queues[port][i].empty():
-                    for j in range(0,self.queues[port][i].qsize()):
-                        packet = self.queues[port][i].get_nowait()
-                        if packet.invalid == 0:
-                            
-                            self.links[port].send(packet, self.addr, currTimeslot)
-                            
-                            # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
-                            # if i == 0:
-                            #     breakpoint()
-                            self.port_qsize[port] -= 1
-                            self.sent+=1
-                            self.total_usage-=1 
-                            self.voq_port_qsize[port-1][i]-=1
-                            flag_1 = 1
-                            assert(self.port_qsize[port] >= 0)
-                            break
-                        else:
-                            self.dropped.append((packet.dstAddr,packet.srcAddr,packet.srcPort,packet.dstPort,packet.seqNum))
-
-                    if flag_1:
-                        break
-
-                else:
-                    continue
+                if self.queues[port][i].size:
+                    packet = self.queues[port][i].pop()
+                    
+                    self.links[port].send(packet, self.addr, currTimeslot)
+                    
+                    # print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
+                    # if i == 0:
+                    #     breakpoint()
+                    self.port_qsize[port] -= 1
+                    self.sent+=1
+                    self.total_usage-=1 
+                    self.voq_port_qsize[port-1][i]-=1
+                    assert(self.port_qsize[port] >= 0)
+                    break
             # start = self.voq_rr[port]
             # flag_1 = 0
             # for i in range(0,len(self.queues[port])+1):
@@ -139,18 +135,20 @@ class Switch():
 
         self.k = 0
         self.buffer = [[-1,-1] for i in range(self.N)]
-        self.largest_index = max(self.port_qsize, key=self.port_qsize.get)
+        self.largest_index = self.port_qsize.longest()
         #print(f"The largest q is {self.largest_index}")
         #print(f"port qsize = {self.port_qsize}")
-        for port in self.links.keys():  # in each timeslot, receive a
-                                        # pa cket (if any) on each input
-                                        # port and handle it
-            packet = self.links[port].recv(self.addr, currTimeslot)
-            if packet:
-                self.handleRecvdPacket(port, packet, currTimeslot)
+        self.inbox.sort(key=lambda arrival: arrival[0])
+        if self.tracer is not None:
+            for port, packet in self.inbox:
+                self.tracer.switchRecvd(currTimeslot, self, port, packet)
+        for port, packet in self.inbox:  # in each timeslot, handle the packets
+                                         # received on the input ports, in port order
+            self.handleRecvdPacket(port, packet, currTimeslot)
+        self.inbox = []
         if self.k>0:
             #self.lvoq = self.priority_encoder(self.largest_index,self.k)
-            mem = self.fetch()
+            mem = self.fetch(currTimeslot)
             self.allct(mem,currTimeslot)
         
         #if self.t > self.t_track:
@@ -159,25 +157,30 @@ class Switch():
         #        print(f"switch {self.addr}, usage = {self.total_usage}, total = {self.total_buffer_size}")
         return self.packet_dropped,self.dropped
         
+    def isIdle(self):
+        """Returns True if nothing is queued at the switch, i.e., runSwitch has
+           nothing to do until a packet arrives on one of its links"""
+        if self.total_usage > 0:
+            return False
+        for port in self.queues:
+            for i in range(self.priority_classes):
+                if self.queues[port][i].size:
+                    return False
+        return True
+
+
     def setECNFlag(self, packet, outPort):
         if self.port_qsize[outPort] > self.K:
             packet.ecnFlag = 1
 
 
-    def ecmp(self, packet):
-        flowid = packet.srcAddr + packet.dstAddr + str(packet.srcPort) + str(packet.dstPort)
-        outPort = int(hashlib.sha256(flowid.encode('utf-8')).hexdigest(), 16) % (self.num_tor_ports - self.hosts_per_rack) + (self.hosts_per_rack + 1)
-        return outPort
-
-
-    def getOutPort(self, switchId, packet):
-        if switchId[0] == 't':
-            if int(packet.dstAddr[1:]) >= int(switchId[1])*16-15 and int(packet.dstAddr[1:]) <= int(switchId[1])*16:
-                return int(packet.dstAddr[1:])-((int(switchId[1])-1)*16)
-            else:
-                return self.ecmp(packet)
-        elif switchId[0] == 'a':
-            return int((int(packet.dstAddr[1:])-1)/16)+1
+    def getOutPort(self, packet):
+        """Returns the output port of packet: the port towards its destination in
+           the routing table, picked by the packet's ECMP hash if there are several"""
+        ports = self.routes[packet.dstAddr]
+        if len(ports) == 1:
+            return ports[0]
+        return ports[(packet.ecmpHash >> self.ecmpShift) % len(ports)]
 ######################################################################## Additional ######################################################################################
 
     def find_index_of_largest(self):
@@ -209,100 +212,68 @@ class Switch():
 
         return 0
     
-    def fetch(self):
+    def fetch(self, currTimeslot):
         """
-        Select up to self.k packets across per-class VOQs at self.largest_index.
-        Debug prints show per-iteration candidates and the chosen (max timestamp) packet.
+        Push out up to self.k packets across per-class VOQs at self.largest_index.
+        Every class offers the packet at the tail of its VOQ; the one that arrived last goes first.
+        At a traced switch, the trace shows per-iteration candidates and the chosen (max timestamp) packet.
         """
         mem_loc = []
-        DEBUG = getattr(self, "debug_fetch", True)
-        DO_BREAK = (getattr(self, "k", 0) > 0)  # ← breakpoints only if k>0
+        DEBUG = self.tracer is not None  # trace the selection at traced switches
 
         if self.largest_index is None or self.largest_index >= len(self.queues):
             if DEBUG:
-                print("[fetch] no queues at largest_index:", self.largest_index)
+                self.tracer.write(currTimeslot, self.addr, f"[fetch] no queues at largest_index: {self.largest_index}")
             return mem_loc
 
         C = getattr(self, "priority_classes", 1)
         port_queues = self.queues[self.largest_index]  # list/array of class queues
 
-        # Per-class candidate: timestamp + position (index inside the deque)
-        ts  = [None] * C
-        pos = [None] * C
-        # Per-class search pointer (start at tail index for each class)
-        ptr = [-1] * C
-
-        # Initialize candidates by scanning from tail for each class queue
         if DEBUG:
-            print(f"[fetch:init] port={self.largest_index}, classes={C}")
-        for i in range(C):
-            if i >= len(port_queues):
-                if DEBUG:
-                    print(f"  [init] class {i}: queue missing")
-                continue
-            q = port_queues[i]
-            n = q.qsize()
-            j = n - 1
-            while j >= 0:
-                pkt = q.queue[j]  # direct access to underlying deque
-                if not getattr(pkt, "invalid", 0):
-                    ts[i] = pkt.ArrivalTimeOnSwitch
-                    pos[i] = j
-                    ptr[i] = j - 1  # next search for this class continues leftward
-                    break
-                j -= 1
-            if j < 0:
-                ptr[i] = -1  # no valid candidate in this class
-            if DEBUG:
-                if ts[i] is not None:
-                    print(f"  [init] class {i}: candidate idx={pos[i]} ts={ts[i]}")
+            self.tracer.write(currTimeslot, self.addr, f"[fetch:init] port={self.largest_index}, classes={C}")
+            for i in range(C):
+                q = port_queues[i]
+                if q.size:
+                    self.tracer.write(currTimeslot, self.addr, f"  [init] class {i}: candidate len={q.size} ts={q.tail.ArrivalTimeOnSwitch}")
                 else:
-                    print(f"  [init] class {i}: no candidate")
+                    self.tracer.write(currTimeslot, self.addr, f"  [init] class {i}: no candidate")
 
         selected = 0
         iter_no = 0
         while selected < self.k:
             iter_no += 1
-            # Pick the class with the largest timestamp among available candidates
+            # Pick the class whose tail has the largest timestamp (the lowest class on ties)
             best_i = None
             best_ts = None
             for i in range(C):
-                if ts[i] is None:
+                q = port_queues[i]
+                if q.size == 0:
                     continue
-                if (best_ts is None) or (ts[i] > best_ts):
-                    best_ts = ts[i]
+                ts = q.tail.ArrivalTimeOnSwitch
+                if (best_ts is None) or (ts > best_ts):
+                    best_ts = ts
                     best_i = i
 
             if DEBUG:
                 cand_str = ", ".join(
-                    [f"c{i}:(idx={pos[i]},ts={ts[i]})" if ts[i] is not None else f"c{i}:(none)"
+                    [f"c{i}:(len={port_queues[i].size},ts={port_queues[i].tail.ArrivalTimeOnSwitch})" if port_queues[i].size else f"c{i}:(none)"
                     for i in range(C)]
                 )
-                print(f"[iter {iter_no}] candidates: {cand_str}")
+                self.tracer.write(currTimeslot, self.addr, f"[iter {iter_no}] candidates: {cand_str}")
                 if best_i is not None:
-                    print(f"[iter {iter_no}] -> choose class {best_i} idx={pos[best_i]} ts={ts[best_i]}")
+                    self.tracer.write(currTimeslot, self.addr, f"[iter {iter_no}] -> choose class {best_i} ts={best_ts}")
 
             if best_i is None:
                 if DEBUG:
-                    print(f"[iter {iter_no}] no candidates left; stopping (selected={selected})")
+                    self.tracer.write(currTimeslot, self.addr, f"[iter {iter_no}] no candidates left; stopping (selected={selected})")
                 break
 
-            # Sanity check: chosen is indeed max among candidates
-            if any(t is not None and t > best_ts for t in ts):
-                print(f"[iter {iter_no}] ERROR: found candidate ts > chosen best_ts "
-                    f"(best_ts={best_ts}, ts={ts})")
-                # if DO_BREAK:
-                #     breakpoint()
-
-            # Commit exactly one packet: mark invalid, update counters, record mem_loc
-            q_best = port_queues[best_i]
-            idx    = pos[best_i]
-            pkt    = q_best.queue[idx]
-            pkt.invalid = 1
+            # Commit exactly one packet: push it out, update counters, record mem_loc
+            pkt = port_queues[best_i].popTail()
+            self.dropped.append((pkt.dstAddr,pkt.srcAddr,pkt.srcPort,pkt.dstPort,pkt.seqNum))
+            self.packetPool.release(pkt)
             self.packet_dropped+=1
             mem_loc.append(1)
-            # if best_i == 0:
-            #     breakpoint()
 
             # Counter updates
             self.port_qsize[self.largest_index] -= 1
@@ -310,50 +281,19 @@ class Switch():
             self.total_usage -= 1
 
             if DEBUG:
-                print(f"[iter {iter_no}] committed: class {best_i}, idx={idx}, ts={best_ts}")
-                print(f"             counters: port_qsize[{self.largest_index}]={self.port_qsize[self.largest_index]}, "
+                self.tracer.write(currTimeslot, self.addr, f"[iter {iter_no}] committed: class {best_i}, ts={best_ts}")
+                self.tracer.write(currTimeslot, self.addr, f"             counters: port_qsize[{self.largest_index}]={self.port_qsize[self.largest_index]}, "
                     f"voq_port_qsize[{self.largest_index-1}][{best_i}]={self.voq_port_qsize[self.largest_index-1][best_i]}, "
                     f"total_usage={self.total_usage}")
 
-            # Refresh ONLY the chosen class's candidate (continue leftward)
-            j = ptr[best_i]
-            found = False
-            while j >= 0:
-                pkt2 = q_best.queue[j]
-                if not getattr(pkt2, "invalid", 0):
-                    ts[best_i]  = pkt2.ArrivalTimeOnSwitch
-                    pos[best_i] = j
-                    ptr[best_i] = j - 1
-                    found = True
-                    break
-                j -= 1
-            if not found:
-                ts[best_i]  = None
-                pos[best_i] = None
-                ptr[best_i] = -1
-
-            if DEBUG:
-                if found:
-                    print(f"[iter {iter_no}] next for class {best_i}: idx={pos[best_i]} ts={ts[best_i]}")
-                else:
-                    print(f"[iter {iter_no}] class {best_i}: no more candidates")
-
             selected += 1
 
         # Post-conditions / sanity checks
         if DEBUG:
-            print(f"[fetch:end] selected={selected}, mem_loc_len={len(mem_loc)}, k={self.k}")
+            self.tracer.write(currTimeslot, self.addr, f"[fetch:end] selected={selected}, mem_loc_len={len(mem_loc)}, k={self.k}")
         if self.k != sum(mem_loc):
             print(f"[fetch:end] WARNING: k({self.k}) != sum(mem_loc)({sum(mem_loc)}).")
-            # if DO_BREAK:
-            #     breakpoint()
-        if selected != len(mem_loc):
-            print(f"[fetch:end] ERROR: selected({selected}) != len(mem_loc)({len(mem_loc)}).")
-            # if DO_BREAK:
-            #     breakpoint()
         
-        # if self.k>8:
-        #     breakpoint()
         return mem_loc
 
 
@@ -364,7 +304,7 @@ class Switch():
         for ind,i in enumerate(self.buffer):
             if i[1] != -1:
                 i[0].ArrivalTimeOnSwitch = currTimeslot
-                self.queues[i[1]][i[0].priority - 1].put(i[0])
+                self.queues[i[1]][i[0].priority - 1].push(i[0])
                 trk +=1
                 self.total_usage +=1
                 self.port_qsize[i[1]] += 1
@@ -372,6 +312,9 @@ class Switch():
                 self.voq_port_qsize[i[1]-1][i[0].priority - 1]+=1
             if trk == space:
                 break
+        for i in self.buffer[ind+1:]:  # no space left for the remaining buffered packets
+            if i[1] != -1:
+                self.packetPool.release(i[0])
         
         
 
@@ -380,14 +323,14 @@ class Switch():
     def handleRecvdPacket(self, inPort, packet, currTimeslot):
         """Handle the packet received on the specified input port 'inPort'.
            arrivalTime is the timeslot in which the packet was received"""
-        outPort = self.getOutPort(self.addr, packet)  # output port the packet needs to be sent out on
+        outPort = self.getOutPort(packet)  # output port the packet needs to be sent out on
         
 ################################################################################ BIT MAPPER ########################################################################################
         if self.total_buffer_size > self.total_usage:
 
             self.total_usage +=1
             packet.ArrivalTimeOnSwitch = currTimeslot
-            self.queues[outPort][packet.priority - 1].put(packet)
+            self.queues[outPort][packet.priority - 1].push(packet)
             self.port_qsize[outPort] += 1
             self.voq_port_qsize[outPort-1][packet.priority - 1]+=1
             self.setECNFlag(packet, outPort)
@@ -406,6 +349,7 @@ class Switch():
             else:
                 self.packet_dropped+=1
                 self.dropped.append((packet.dstAddr,packet.srcAddr,packet.srcPort,packet.dstPort,packet.seqNum)) 
+                self.packetPool.release(packet)
             #breakpoint()      
 
 
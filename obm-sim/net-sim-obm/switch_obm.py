@@ -3,8 +3,8 @@
 
 import sys
 import queue
-import hashlib
 from link import Link
+from queuelengths import QueueLengths
 import math
 import copy
 
@@ -15,8 +15,16 @@ class Switch():
     def __init__(self, addr, num_tor_ports, num_agg_ports, hosts_per_rack):
         """Initialize parameters"""
         self.addr = addr  # address of switch
+        self.id = None  # node ID, assigned by the network
+        self.nodeNames = None  # node names indexed by node ID, for routing and logs
+        self.packetPool = None  # dropped and pushed-out packets are released to this pool
+        self.tracer = None  # Tracer, None unless this switch is traced
+        self.routes = None  # by destination host ID, the tuple of ports that ECMP spreads the flows over
+        self.ecmpShift = 0  # the ports are picked by the ECMP hash shifted right by this many bits
         self.links = {}   # links indexed by port, i.e., {port:link, ......, port:link}
-        self.queues = {}  # list of virtual output queues (of type queue.Queue) per port
+        self.inbox = []   # packets delivered from the links in this timeslot, as (port, packet);
+                          # at most one per port, as each link carries at most one packet per timeslot
+        self.queues = {}  # list of virtual output queues (of type VOQ) per port
                           # indexed by port, i.e., {port:[queue], ......, port:[queue]}
                           # each virtual output queue is a FIFO queue of infinite size
         self.voq_rr = {}  # stores the VOQ per port to be serviced next
@@ -29,7 +37,7 @@ class Switch():
         self.tor_buff_size = self.per_port_max_qsize * self.num_tor_ports # in terms of number of packets
         self.agg_buff_size = self.per_port_max_qsize * self.num_agg_ports # in terms of number of packets
         self.packet_dropped = 0
-        self.port_qsize = {}  # number of packets queued per port
+        self.port_qsize = QueueLengths()  # number of packets queued per port, knows its longest port
         self.priority_classes = 3
         
         
@@ -40,7 +48,7 @@ class Switch():
             self.N = 1 if num_tor_ports < 1 else 2 ** ((num_tor_ports - 1).bit_length())
             self.voq_port_qsize = [[0 for i in range(self.priority_classes)] for _ in range(self.N)]
             print(num_tor_ports)
-        elif self.addr[0] == 'a':
+        elif self.addr[0] == 'a' or self.addr[0] == 'c':  # core switches are set up like aggregation switches
             
             self.ports = num_agg_ports
             self.total_buffer_size = self.per_port_max_qsize*num_agg_ports
@@ -75,47 +83,39 @@ class Switch():
                                         # at the head of a VOQ at each port.
                                         # VOQs at each port are scheduled in
                                         # round robin manner
-            flag_1 = 0
             for i in range(self.priority_classes):
-                if not self.queues[port][i].empty():
-                    for j in range(0,self.queues[port][i].qsize()):
-                        packet = self.queues[port][i].get_nowait()
-                        if packet.invalid == 0:
-                            # if self.priority_max_q_l<self.voq_port_qsize[port-1][0]:
-                            #     self.priority_max_q_l = self.voq_port_qsize[port-1][0]
-                            #     print(self.priority_max_q_l)
-                            #     with open("/home/dan/LQD/obm-sim/obm-sim/max_q_len.txt", "a", encoding="utf-8") as f:
-                            #         f.write(f"{self.priority_max_q_l},{self.voq_port_qsize[port-1][1]},{self.voq_port_qsize[port-1][2]}\n")
-                            
-                            self.links[port].send(packet, self.addr, currTimeslot)
-                            # if self.addr == 't1' and port == 7:
-                            #     print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
-                            # # if i == 0:
-                            #     breakpoint()
-                            self.port_qsize[port] -= 1
-                            self.sent+=1
-                            self.total_usage-=1 
-                            self.voq_port_qsize[port-1][i]-=1
-                            flag_1 = 1
-                            assert(self.port_qsize[port] >= 0)
-                            break
-
-                    if flag_1:
-                        break
-
-                else:
-                    continue
+                if self.queues[port][i].size:
+                    packet = self.queues[port][i].pop()
+                    # if self.priority_max_q_l<self.voq_port_qsize[port-1][0]:
+                    #     self.priority_max_q_l = self.voq_port_qsize[port-1][0]
+                    #     print(self.priority_max_q_l)
+                    #     with open("/home/dan/LQD/obm-sim/obm-sim/max_q_len.txt", "a", encoding="utf-8") as f:
+                    #         f.write(f"{self.priority_max_q_l},{self.voq_port_qsize[port-1][1]},{self.voq_port_qsize[port-1][2]}\n")
+                    
+                    self.links[port].send(packet, self.addr, currTimeslot)
+                    # if self.addr == 't1' and port == 7:
+                    #     print(f"sending packet from {i} when other prioritites have length = {self.voq_port_qsize[port-1]}")
+                    # # if i == 0:
+                    #     breakpoint()
+                    self.port_qsize[port] -= 1
+                    self.sent+=1
+                    self.total_usage-=1 
+                    self.voq_port_qsize[port-1][i]-=1
+                    assert(self.port_qsize[port] >= 0)
+                    break
         self.k = 0
         self.buffer = [[-1,-1] for i in range(self.N)]
-        self.largest_index = max(self.port_qsize, key=self.port_qsize.get)
+        self.largest_index = self.port_qsize.longest()
         #print(f"The largest q is {self.largest_index}")
         #print(f"port qsize = {self.port_qsize}")
-        for port in self.links.keys():  # in each timeslot, receive a
-                                        # pa cket (if any) on each input
-                                        # port and handle it
-            packet = self.links[port].recv(self.addr, currTimeslot)
-            if packet:
-                self.handleRecvdPacket(port, packet, currTimeslot)
+        self.inbox.sort(key=lambda arrival: arrival[0])
+        if self.tracer is not None:
+            for port, packet in self.inbox:
+                self.tracer.switchRecvd(currTimeslot, self, port, packet)
+        for port, packet in self.inbox:  # in each timeslot, handle the packets
+                                         # received on the input ports, in port order
+            self.handleRecvdPacket(port, packet, currTimeslot)
+        self.inbox = []
         
         # for different priority classes coming into picture the conditions for priority encoder check becomes a little different
         if self.k>0:
@@ -131,6 +131,18 @@ class Switch():
         #        print(f"switch {self.addr}, usage = {self.total_usage}, total = {self.total_buffer_size}")
 
 
+    def isIdle(self):
+        """Returns True if nothing is queued at the switch, i.e., runSwitch has
+           nothing to do until a packet arrives on one of its links"""
+        if self.total_usage > 0:
+            return False
+        for port in self.queues:
+            for i in range(self.priority_classes):
+                if self.queues[port][i].size:
+                    return False
+        return True
+
+
     def setECNFlag(self, packet, outPort):
         if self.port_qsize[outPort] > self.K:
             packet.ecnFlag = 1
@@ -139,20 +151,13 @@ class Switch():
                 #breakpoint()
 
 
-    def ecmp(self, packet):
-        flowid = packet.srcAddr + packet.dstAddr + str(packet.srcPort) + str(packet.dstPort)
-        outPort = int(hashlib.sha256(flowid.encode('utf-8')).hexdigest(), 16) % (self.num_tor_ports - self.hosts_per_rack) + (self.hosts_per_rack + 1)
-        return outPort
-
-
-    def getOutPort(self, switchId, packet):
-        if switchId[0] == 't':
-            if int(packet.dstAddr[1:]) >= int(switchId[1])*16-15 and int(packet.dstAddr[1:]) <= int(switchId[1])*16:
-                return int(packet.dstAddr[1:])-((int(switchId[1])-1)*16)
-            else:
-                return self.ecmp(packet)
-        elif switchId[0] == 'a':
-            return int((int(packet.dstAddr[1:])-1)/16)+1
+    def getOutPort(self, packet):
+        """Returns the output port of packet: the port towards its destination in
+           the routing table, picked by the packet's ECMP hash if there are several"""
+        ports = self.routes[packet.dstAddr]
+        if len(ports) == 1:
+            return ports[0]
+        return ports[(packet.ecmpHash >> self.ecmpShift) % len(ports)]
 ######################################################################## Additional ######################################################################################
 
     def find_index_of_largest(self):
@@ -192,30 +197,16 @@ class Switch():
         mem_loc = []
         target_queue = self.queues[self.largest_index][self.lvoq]
         
-        # if self.flag == 1:  
-        #     print(f"target queue = {target_queue.qsize()}") # actual q size
-        #     print(f"maxsize queue = {target_queue.maxsize}")
         #print(k)
         for h in range(self.k):
-            if not target_queue.empty():  # Ensure the queue is not empty
+            if target_queue.size:  # Ensure the queue is not empty
                 #print(f"Have removed an element from voq [{self.largest_index-1},{self.lvoq}]")
                 #print(f"Number of packets available: {self.voq_port_qsize[self.largest_index-1][self.lvoq]}")
                 
-                # Access the last element directly
-                #print(f"In contrast we have only {target_queue.qsize()} packets")
-                #last_element = target_queue.queue.pop()  # Access the last element
-                #last_element.invalid = 1  # Mark it as invalid (or any custom modification)
-                c = 0
-                while target_queue.queue[target_queue.qsize()-c-1].invalid ==1 and c!=target_queue.qsize():
-                    c+=1
-                if c==target_queue.qsize(): 
-                    self.flag = 1
-                    break
-                target_queue.queue[target_queue.qsize()-c-1].invalid = 1
+                # Push out the last element
+                self.packetPool.release(target_queue.popTail())
                 mem_loc.append(1)  # Log the memory location (example)
 
-                # Optionally remove the last element
-                #target_queue.queue.pop()  # Remove the last element if needed
                 self.port_qsize[self.largest_index] -= 1
                 self.voq_port_qsize[self.largest_index-1][self.lvoq] -= 1
                 self.total_usage -= 1 
@@ -231,7 +222,7 @@ class Switch():
         trk = 0
         for ind,i in enumerate(self.buffer):
             if i[1] != -1:
-                self.queues[i[1]][i[0].priority-1].put(i[0])
+                self.queues[i[1]][i[0].priority-1].push(i[0])
                 trk +=1
                 self.total_usage +=1
                 self.port_qsize[i[1]] += 1
@@ -239,6 +230,9 @@ class Switch():
                 self.voq_port_qsize[i[1]-1][i[0].priority-1]+=1
             if trk == space:
                 break
+        for i in self.buffer[ind+1:]:  # no space left for the remaining buffered packets
+            if i[1] != -1:
+                self.packetPool.release(i[0])
         
         
 
@@ -247,13 +241,13 @@ class Switch():
     def handleRecvdPacket(self, inPort, packet, arrivalTime):
         """Handle the packet received on the specified input port 'inPort'.
            arrivalTime is the timeslot in which the packet was received"""
-        outPort = self.getOutPort(self.addr, packet)  # output port the packet needs to be sent out on
+        outPort = self.getOutPort(packet)  # output port the packet needs to be sent out on
         
 ################################################################################ BIT MAPPER ########################################################################################
         if self.total_buffer_size > self.total_usage:
 
             self.total_usage +=1
-            self.queues[outPort][packet.priority-1].put(packet)
+            self.queues[outPort][packet.priority-1].push(packet)
             self.port_qsize[outPort] += 1
             self.voq_port_qsize[outPort-1][packet.priority-1]+=1
             self.setECNFlag(packet, outPort)
@@ -281,6 +275,7 @@ class Switch():
             else:
                 if packet.priority == 1:
                     print("strt drop")
+                self.packetPool.release(packet)
                     
             #     if packet.dstAddr == 'h29':
             #         #breakpoint()
@@ -1,3 +1,4 @@
+import os
 import sys
 import numpy as np
 
@@ -6,7 +7,7 @@ algo = sys.argv[1]
 wkld = sys.argv[2]
 #folder = sys.argv[3]
 #path = f'net-sim-{algo}/prev_logs/{folder}/recvd-flows-{wkld}.txt'
-path = f'net-sim-{algo}/logs/recvd-flows-{wkld}.txt'
+path = f'net-sim-{algo}/logs/recvd-flows-{wkld}'
 # Helpers
 def next_token_value(tokens, key_with_colon):
     # find "flowsize:", "fct:", "recvtput:" and return the very next token (comma stripped)
@@ -15,37 +16,48 @@ def next_token_value(tokens, key_with_colon):
             return tokens[i+1].rstrip(',')  # strip trailing comma if present
     return None
 
-fct_short, fct_long = [], []
-tput_short, tput_long = [], []
+def load_text(path):
+    # parse the text log of older runs into (flowsize, fct in timeslots, recvtput) columns
+    sizes, fcts, tputs = [], [], []
+    with open(path, 'r') as f:
+        for line in f:
+            tokens = line.strip().split()
+            if not tokens:
+                continue
 
-with open(path, 'r') as f:
-    for line in f:
-        tokens = line.strip().split()
-        if not tokens:
-            continue
+            # Parse required fields robustly by key
+            flowsize_s = next_token_value(tokens, 'flowsize:')
+            fct_slots_s = next_token_value(tokens, 'fct:')
+            recvtput_s = next_token_value(tokens, 'recvtput:')
 
-        # Parse required fields robustly by key
-        flowsize_s = next_token_value(tokens, 'flowsize:')
-        fct_slots_s = next_token_value(tokens, 'fct:')
-        recvtput_s = next_token_value(tokens, 'recvtput:')
+            # Skip lines missing required fields
+            if flowsize_s is None or fct_slots_s is None or recvtput_s is None:
+                continue
 
-        # Skip lines missing required fields
-        if flowsize_s is None or fct_slots_s is None or recvtput_s is None:
-            continue
+            try:
+                flowsize = int(flowsize_s)
+                fct_slots = int(fct_slots_s)
+                recvtput_gbps = float(recvtput_s)          # 'Gbps' unit comes in the next token
+            except ValueError:
+                continue  # skip malformed lines
+            sizes.append(flowsize)
+            fcts.append(fct_slots)
+            tputs.append(recvtput_gbps)
+    return np.array(sizes, dtype=np.int64), np.array(fcts, dtype=np.int64), np.array(tputs, dtype=np.float64)
 
-        try:
-            flowsize = int(flowsize_s)
-            fct_us = round(int(fct_slots_s) * 0.12, 3)  # 120 ns per timeslot → microseconds
-            recvtput_gbps = float(recvtput_s)          # 'Gbps' unit comes in the next token
-        except ValueError:
-            continue  # skip malformed lines
+# The flow columns written by network.py (.npy), or the text log of older runs
+if os.path.exists(path + '.npy'):
+    flows = np.load(path + '.npy')
+    size, fct = flows['size'], flows['fct']
+    recvtput = np.array([round(t, 2) for t in flows['recvtput'].tolist()])  # rounded as in the text log
+else:
+    size, fct, recvtput = load_text(path + '.txt')
 
-        if flowsize < 100:
-            fct_short.append(fct_us)
-            tput_short.append(recvtput_gbps)
-        elif flowsize > 1000:
-            fct_long.append(fct_us)
-            tput_long.append(recvtput_gbps)
+fct_us = np.round(fct * 0.12, 3)  # 120 ns per timeslot → microseconds
+short = size < 100
+long = size > 1000
+fct_short, fct_long = fct_us[short].tolist(), fct_us[long].tolist()
+tput_short, tput_long = recvtput[short].tolist(), recvtput[long].tolist()
 
 # ---- FCT stats (unchanged behavior) ----
 def print_fct_stats(name, arr):